@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Pick the training batch size and BLAS thread count for an architecture.
+
+Each candidate (batch size, threads) runs NeuralNetwork.train_step on random
+data for a short time. The fastest candidate in images/sec whose per-batch
+latency stays within the budget wins; when candidates are within a few
+percent of each other the one using fewer threads is preferred, leaving
+cores for other runs on the same host.
+
+Decisions are cached per (architecture, CPU model) in a JSON file, so the
+benchmark only runs once per host.
+
+Usage (from src/):
+    python autotune.py 784 128 64 10
+"""
+import argparse
+import json
+import os
+import platform
+import time
+
+import numpy as np
+
+from network import CrossEntropy, SGD, build_network
+from network.threads import can_limit_threads, current_blas_threads, limit_blas_threads
+
+AUTOTUNE_CACHE = os.getenv("AUTOTUNE_CACHE", os.path.join("models", "autotune.json"))
+
+DEFAULT_BATCH_SIZES = (32, 64, 128, 256, 512)
+# Per-batch latency budget; keeps broadcasts and stop requests responsive
+DEFAULT_LATENCY_BUDGET_MS = 50.0
+# Candidates this close to the best throughput count as ties
+TIE_TOLERANCE = 0.05
+
+def cpu_model():
+    try:
+        with open("/proc/cpuinfo") as f:
+            for line in f:
+                if line.startswith("model name"):
+                    return line.split(":", 1)[1].strip()
+    except OSError:
+        pass
+    return platform.processor() or platform.machine()
+
+def cache_key(architecture):
+    layers = '-'.join(json.dumps(n, sort_keys=True) if isinstance(n, dict) else str(n) for n in architecture)
+    return f"{cpu_model()} x{os.cpu_count()}|{layers}"
+
+def default_thread_counts():
+    if not can_limit_threads():
+        # Without threadpoolctl the thread count can't change at runtime
+        return (None,)
+    cpus = os.cpu_count() or 1
+    counts = {1, cpus}
+    n = 2
+    while n < cpus:
+        counts.add(n)
+        n *= 2
+    return tuple(sorted(counts))
+
+def measure(architecture, batch_size, threads, seconds=0.25, warmup=2):
+    """Returns (images_per_sec, ms_per_batch) for one candidate."""
+    nn = build_network(architecture)
+    loss_fn = CrossEntropy()
+    optimizer = SGD(learning_rate=0.01, momentum=0.9)
+    x = np.random.rand(batch_size, architecture[0]).astype(np.float32)
+    y = np.zeros((batch_size, architecture[-1]))
+    y[np.arange(batch_size), np.random.randint(0, architecture[-1], batch_size)] = 1
+
+    with limit_blas_threads(threads):
+        for _ in range(warmup):
+            nn.train_step(x, y, loss_fn, optimizer)
+        steps = 0
+        start = time.perf_counter()
+        while True:
+            nn.train_step(x, y, loss_fn, optimizer)
+            steps += 1
+            elapsed = time.perf_counter() - start
+            if elapsed >= seconds:
+                break
+    return batch_size * steps / elapsed, 1000 * elapsed / steps
+
+def load_cache(path=AUTOTUNE_CACHE):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_cache(cache, path=AUTOTUNE_CACHE):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(cache, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+def autotune(architecture, batch_sizes=DEFAULT_BATCH_SIZES, thread_counts=None,
+             latency_budget_ms=DEFAULT_LATENCY_BUDGET_MS, seconds=0.25,
+             cache_path=AUTOTUNE_CACHE, refresh=False, verbose=False):
+    """
+    Return the tuning decision for architecture:
+    {"batch_size", "threads", "images_per_sec", "ms_per_batch", "cpu", "cached"}.
+    threads is None when the BLAS thread count can't be controlled.
+    """
+    key = cache_key(architecture)
+    cache = load_cache(cache_path) if cache_path else {}
+    if not refresh and key in cache:
+        return dict(cache[key], cached=True)
+
+    if thread_counts is None:
+        thread_counts = default_thread_counts()
+    results = []
+    for threads in thread_counts:
+        for batch_size in batch_sizes:
+            images_per_sec, ms_per_batch = measure(architecture, batch_size, threads, seconds)
+            results.append((images_per_sec, ms_per_batch, batch_size, threads))
+            if verbose:
+                print(f"  batch={batch_size:<4} threads={threads or 'default':<8} "
+                      f"{images_per_sec:>10.0f} img/s {ms_per_batch:>8.2f} ms/batch")
+
+    within_budget = [r for r in results if r[1] <= latency_budget_ms]
+    # Nothing fits the budget: take the lowest-latency candidate instead
+    candidates = within_budget or [min(results, key=lambda r: r[1])]
+    best_rate = max(r[0] for r in candidates)
+    ties = [r for r in candidates if r[0] >= best_rate * (1 - TIE_TOLERANCE)]
+    images_per_sec, ms_per_batch, batch_size, threads = min(
+        ties, key=lambda r: (r[3] or 0, -r[0])
+    )
+
+    decision = {
+        "batch_size": batch_size,
+        "threads": threads,
+        "images_per_sec": round(images_per_sec, 1),
+        "ms_per_batch": round(ms_per_batch, 3),
+        "latency_budget_ms": latency_budget_ms,
+        "default_threads": current_blas_threads(),
+        "cpu": cpu_model(),
+        "tuned_at": time.strftime("%Y-%m-%dT%H:%M:%S")
+    }
+    if cache_path:
+        cache[key] = decision
+        save_cache(cache, cache_path)
+    return dict(decision, cached=False)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("architecture", type=int, nargs="*", default=[784, 128, 64, 10])
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=list(DEFAULT_BATCH_SIZES))
+    parser.add_argument("--threads", type=int, nargs="+", default=None)
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_LATENCY_BUDGET_MS)
+    parser.add_argument("--seconds", type=float, default=0.25, help="Benchmark time per candidate")
+    parser.add_argument("--refresh", action="store_true", help="Ignore the cached decision")
+    args = parser.parse_args()
+
+    print(f"Autotuning {args.architecture} on {cpu_model()}")
+    decision = autotune(
+        args.architecture, args.batch_sizes, args.threads, args.budget_ms,
+        args.seconds, refresh=args.refresh, verbose=True
+    )
+    print(json.dumps(decision, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for the visualizer backend.
+
+Usage (from src/):
+    python benchmark.py ws          # WebSocket payload size / encode cost
+    python benchmark.py prune       # accuracy vs sparsity vs inference latency
+    python benchmark.py quant       # int8 vs float accuracy, size and latency
+    python benchmark.py conv        # MLP vs CNN parameters, FLOPs and throughput
+    python benchmark.py optim       # wall-clock time to a target accuracy per optimizer
+"""
+import argparse
+import json
+import time
+import zlib
+
+import numpy as np
+
+from network import (
+    Dense, Conv2D, CrossEntropy, SGD, Adam, AdamW, RMSProp,
+    EarlyStopping, build_network, make_schedule
+)
+from network.pruning import prune, fine_tune, to_sparse
+from network.quantization import quantize_network, compare as compare_quantized
+from data.loader import download_mnist, load_mnist, preprocess_data, get_batches
+from train_mnist import compute_accuracy
+from serving.protocol import OutboundMessage, encode_frame, PROTOCOL_JSON, PROTOCOL_BINARY
+
+
+def time_per_call(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+
+def deflate(data):
+    # Same settings as the permessage-deflate extension (raw deflate stream)
+    compressor = zlib.compressobj(wbits=-15)
+    return compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH)
+
+
+def update_payload(nn, batch_size=64):
+    nn.forward(np.random.rand(batch_size, nn.layers[0].weights.shape[0]))
+    activations = [np.mean(layer.output, axis=0)[:100].astype(np.float32) for layer in nn.layers]
+    return {
+        "type": "update",
+        "stats": {"epoch": 1, "batch": 120, "loss": 0.4312, "accuracy": 0.875},
+        "activations": activations
+    }
+
+
+def bench_ws(args):
+    nn = build_network(args.arch)
+    payload = update_payload(nn)
+
+    # The original path: float64 lists through json.dumps, one text frame each
+    legacy = dict(payload, activations=[a.astype(np.float64).tolist() for a in payload["activations"]])
+    variants = [("legacy json", lambda: json.dumps(legacy).encode())]
+    variants.append(("json", lambda: encode_frame([OutboundMessage(payload)], PROTOCOL_JSON).encode()))
+    for precision in ("f32", "f16", "u8"):
+        variants.append((
+            f"binary {precision}",
+            lambda p=precision: encode_frame([OutboundMessage(payload)], PROTOCOL_BINARY, p)
+        ))
+
+    print(f"Architecture {args.arch}, {args.clients} clients, {args.repeat} repetitions")
+    print(f"{'format':<14}{'bytes':>9}{'deflated':>10}{'encode us':>11}{'deflate us/client':>19}{'server us/update':>18}")
+    for name, encode in variants:
+        frame = encode()
+        deflated = deflate(frame)
+        encode_s = time_per_call(encode, args.repeat)
+        deflate_s = time_per_call(lambda: deflate(frame), args.repeat)
+        # Encoding is shared by all clients, compression is per connection
+        total_s = encode_s + deflate_s * args.clients
+        print(f"{name:<14}{len(frame):>9}{len(deflated):>10}{encode_s * 1e6:>11.1f}"
+              f"{deflate_s * 1e6:>19.1f}{total_s * 1e6:>18.1f}")
+
+    # Coalescing: N queued updates in one frame vs N separate frames
+    messages = [OutboundMessage(update_payload(nn)) for _ in range(args.coalesce)]
+    separate = sum(len(deflate(encode_frame([m], PROTOCOL_BINARY, "f16"))) for m in messages)
+    coalesced = len(deflate(encode_frame(messages, PROTOCOL_BINARY, "f16")))
+    print(f"\n{args.coalesce} f16 updates: {separate} bytes as separate frames, {coalesced} bytes coalesced")
+
+
+def load_data():
+    download_mnist()
+    (x_train, y_train), (x_test, y_test) = load_mnist()
+    return preprocess_data(x_train, y_train), preprocess_data(x_test, y_test)
+
+
+def train_mlp(arch, x, y, epochs=1, batch_size=64):
+    nn = build_network(arch)
+    loss_fn = CrossEntropy()
+    optimizer = SGD(learning_rate=0.01, momentum=0.9)
+    for _ in range(epochs):
+        for x_batch, y_batch in get_batches(x, y, batch_size):
+            nn.train_step(x_batch, y_batch, loss_fn, optimizer)
+    return nn
+
+
+def bench_prune(args):
+    (x_train, y_train), (x_test, y_test) = load_data()
+    print(f"Training {args.arch} for {args.epochs} epoch(s)...")
+    base = train_mlp(args.arch, x_train, y_train, args.epochs)
+    base_state = base.get_state()
+    x_one, x_batch = x_test[:1], x_test[:args.batch]
+
+    print(f"{args.scope} pruning, fine-tune {args.fine_tune} batches, latency per call "
+          f"(batch 1 / batch {args.batch}, {args.repeat} repetitions)")
+    print(f"{'sparsity':>9}{'accuracy':>10}{'tuned':>8}{'dense us':>10}{'sparse us':>11}"
+          f"{'dense us':>10}{'sparse us':>11}")
+    for sparsity in args.sparsities:
+        nn = build_network(args.arch)
+        nn.set_state(base_state)
+        masks = prune(nn, sparsity, args.scope)
+        accuracy = compute_accuracy(y_test, nn.infer(x_test))
+        tuned = accuracy
+        if args.fine_tune:
+            fine_tune(nn, masks, x_train, y_train, batches=args.fine_tune)
+            tuned = compute_accuracy(y_test, nn.infer(x_test))
+        # Convert every layer so the sparse kernel is measured even at low sparsity
+        sparse = to_sparse(nn, min_sparsity=0)
+        if not np.allclose(sparse.infer(x_batch), nn.infer(x_batch)):
+            raise AssertionError(f"SparseDense output differs from Dense at sparsity {sparsity}")
+        timings = [
+            time_per_call(lambda: net.infer(x), args.repeat)
+            for x in (x_one, x_batch) for net in (nn, sparse)
+        ]
+        print(f"{sparsity:>9.2f}{accuracy:>10.4f}{tuned:>8.4f}" +
+              "".join(f"{t * 1e6:>{w}.1f}" for t, w in zip(timings, (10, 11, 10, 11))))
+
+
+def bench_quant(args):
+    (x_train, y_train), (x_test, y_test) = load_data()
+    print(f"Training {args.arch} for {args.epochs} epoch(s)...")
+    nn = train_mlp(args.arch, x_train, y_train, args.epochs)
+    quantized = quantize_network(nn, x_test[:args.calibration], args.percentile)
+    # Accuracy on the rest of the test set, which calibration never saw
+    report = compare_quantized(nn, quantized, x_test[args.calibration:], y_test[args.calibration:], args.repeat, args.batch)
+
+    print(f"Calibrated on {args.calibration} test images (percentile {args.percentile}), "
+          f"evaluated on the other {len(x_test) - args.calibration}")
+    print(f"{'':<10}{'accuracy':>10}{'bytes':>10}{'us batch 1':>12}{f'us batch {args.batch}':>14}")
+    for name in ("float", "int8"):
+        print(f"{name:<10}{report[name + '_accuracy']:>10.4f}{report[name + '_bytes']:>10}"
+              f"{report[name + '_us_batch1']:>12.1f}{report[name + f'_us_batch{args.batch}']:>14.1f}")
+    print(f"\naccuracy delta {report['accuracy_delta']:+.4f}, weights {report['size_ratio']:.1f}x smaller")
+
+
+def forward_macs(nn, input_size):
+    """Multiply-accumulates of one image's forward pass."""
+    x = np.zeros((1, input_size))
+    macs = 0
+    for layer in nn.layers:
+        x = layer.forward(x)
+        if isinstance(layer, Conv2D):
+            macs += x.shape[1] * x.shape[2] * layer.weights.size
+        elif isinstance(layer, Dense):
+            macs += layer.weights.size
+    return macs
+
+
+def images_per_sec(fn, batch_size, seconds):
+    fn()
+    calls, start = 0, time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        fn()
+        calls += 1
+    return calls * batch_size / (time.perf_counter() - start)
+
+
+def bench_conv(args):
+    models = {"mlp": args.mlp, "cnn": args.cnn}
+    if args.epochs:
+        (x_train, y_train), (x_test, y_test) = load_data()
+    else:
+        x_train = np.random.rand(args.batch, 784)
+        y_train = np.eye(10)[np.random.randint(0, 10, args.batch)]
+    x, y = x_train[:args.batch], y_train[:args.batch]
+    loss_fn = CrossEntropy()
+
+    print(f"Throughput at batch {args.batch} ({args.seconds}s per measurement)")
+    print(f"{'model':<6}{'params':>10}{'MFLOPs':>9}{'train img/s':>13}{'infer img/s':>13}{'accuracy':>10}")
+    for name, arch in models.items():
+        nn = build_network(arch)
+        params = sum(layer.weights.size + layer.bias.size for layer in nn.layers if getattr(layer, "weights", None) is not None)
+        mflops = 2 * forward_macs(nn, arch[0]) / 1e6
+        optimizer = SGD(learning_rate=0.01, momentum=0.9)
+        train = images_per_sec(lambda: nn.train_step(x, y, loss_fn, optimizer), args.batch, args.seconds)
+        infer = images_per_sec(lambda: nn.infer(x), args.batch, args.seconds)
+        accuracy = "-"
+        if args.epochs:
+            nn = build_network(arch)
+            optimizer = SGD(learning_rate=0.01, momentum=0.9)
+            for _ in range(args.epochs):
+                for x_batch, y_batch in get_batches(x_train, y_train, args.batch):
+                    nn.train_step(x_batch, y_batch, loss_fn, optimizer)
+            accuracy = f"{compute_accuracy(y_test, nn.infer(x_test)):.4f}"
+        print(f"{name:<6}{params:>10}{mflops:>9.2f}{train:>13.0f}{infer:>13.0f}{accuracy:>10}")
+
+
+OPTIMIZERS = {
+    "sgd": lambda lr: SGD(lr or 0.01, momentum=0.9),
+    "adam": lambda lr: Adam(lr or 0.001),
+    "adamw": lambda lr: AdamW(lr or 0.001),
+    "rmsprop": lambda lr: RMSProp(lr or 0.001),
+}
+
+
+def update_cost(name, arch, x, y, repeat=100):
+    """Seconds per optimizer.update() on a throwaway network with gradients set."""
+    nn = build_network(arch)
+    optimizer = OPTIMIZERS[name](None)
+    nn.train_step(x, y, CrossEntropy(), optimizer)
+    return time_per_call(lambda: optimizer.update(nn.layers), repeat)
+
+
+def bench_optim(args):
+    (x_train, y_train), (x_test, y_test) = load_data()
+    x_eval, y_eval = x_test[:args.eval_size], y_test[:args.eval_size]
+    steps_per_epoch = -(-len(x_train) // args.batch)
+    loss_fn = CrossEntropy()
+
+    print(f"{args.arch}, batch {args.batch}, {args.schedule} schedule (warmup {args.warmup}), "
+          f"target {args.target:.3f} on {args.eval_size} test images, checked every {args.eval_every} batches")
+    print(f"{'optimizer':<10}{'lr':>8}{'batches':>9}{'seconds':>9}{'accuracy':>10}{'update us':>11}  result")
+    for name in args.optimizers:
+        update_us = 1e6 * update_cost(name, args.arch, x_train[:args.batch], y_train[:args.batch])
+        np.random.seed(args.seed)
+        nn = build_network(args.arch)
+        optimizer = OPTIMIZERS[name](args.lr)
+        schedule = make_schedule(args.schedule, optimizer.learning_rate, args.epochs * steps_per_epoch, args.warmup)
+        stopper = EarlyStopping(target=args.target)
+        train_seconds = 0.0
+        accuracy, result = 0.0, f"not reached in {args.epochs} epoch(s)"
+        for _ in range(args.epochs):
+            for x_batch, y_batch in get_batches(x_train, y_train, args.batch):
+                start = time.perf_counter()
+                nn.train_step(x_batch, y_batch, loss_fn, optimizer, schedule=schedule)
+                train_seconds += time.perf_counter() - start
+                if optimizer.iterations % args.eval_every == 0:
+                    accuracy = compute_accuracy(y_eval, nn.infer(x_eval))
+                    if stopper.update(optimizer.iterations, accuracy):
+                        result = "reached"
+                        break
+            if stopper.reason:
+                break
+        print(f"{name:<10}{schedule.learning_rate:>8.4f}{optimizer.iterations:>9}{train_seconds:>9.2f}"
+              f"{accuracy:>10.4f}{update_us:>11.1f}  {result}")
+
+
+BENCHMARKS = {
+    "ws": bench_ws,
+    "prune": bench_prune,
+    "quant": bench_quant,
+    "conv": bench_conv,
+    "optim": bench_optim,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="benchmark", required=True)
+
+    ws = sub.add_parser("ws", help="WebSocket payload size and encoding cost")
+    ws.add_argument("--arch", type=int, nargs="+", default=[784, 128, 64, 10])
+    ws.add_argument("--clients", type=int, default=30)
+    ws.add_argument("--coalesce", type=int, default=4)
+    ws.add_argument("--repeat", type=int, default=200)
+
+    pr = sub.add_parser("prune", help="Accuracy vs sparsity vs inference latency of magnitude pruning")
+    pr.add_argument("--arch", type=int, nargs="+", default=[784, 128, 64, 10])
+    pr.add_argument("--epochs", type=int, default=1)
+    pr.add_argument("--sparsities", type=float, nargs="+", default=[0.0, 0.5, 0.8, 0.9, 0.95, 0.98])
+    pr.add_argument("--scope", choices=["global", "layer"], default="global")
+    pr.add_argument("--fine-tune", type=int, default=200, help="Fine-tuning batches after pruning (0 = none)")
+    pr.add_argument("--batch", type=int, default=64)
+    pr.add_argument("--repeat", type=int, default=200)
+
+    qt = sub.add_parser("quant", help="int8 post-training quantization vs the float path")
+    qt.add_argument("--arch", type=int, nargs="+", default=[784, 128, 64, 10])
+    qt.add_argument("--epochs", type=int, default=1)
+    qt.add_argument("--calibration", type=int, default=1000, help="Test images used for calibration")
+    qt.add_argument("--percentile", type=float, default=100.0, help="Activation range percentile")
+    qt.add_argument("--batch", type=int, default=64)
+    qt.add_argument("--repeat", type=int, default=200)
+
+    cv = sub.add_parser("conv", help="Parameters, FLOPs and throughput of an MLP vs a small CNN")
+    cv.add_argument("--mlp", type=json.loads, default=[784, 128, 64, 10], help="JSON architecture")
+    cv.add_argument("--cnn", type=json.loads, default=[
+        784, {"type": "conv", "filters": 8, "padding": 1}, {"type": "pool"},
+        {"type": "conv", "filters": 16, "padding": 1}, {"type": "pool"}, 64, 10
+    ], help="JSON architecture with conv/pool layers (see build_network)")
+    cv.add_argument("--epochs", type=int, default=0, help="Train and report test accuracy (0 = throughput only)")
+    cv.add_argument("--batch", type=int, default=64)
+    cv.add_argument("--seconds", type=float, default=2.0)
+
+    op = sub.add_parser("optim", help="Wall-clock time to a target test accuracy for each optimizer")
+    op.add_argument("--arch", type=int, nargs="+", default=[784, 128, 64, 10])
+    op.add_argument("--optimizers", nargs="+", choices=list(OPTIMIZERS), default=list(OPTIMIZERS))
+    op.add_argument("--lr", type=float, default=None, help="Base learning rate (default: per optimizer)")
+    op.add_argument("--schedule", choices=["constant", "step", "cosine"], default="cosine")
+    op.add_argument("--warmup", type=int, default=100)
+    op.add_argument("--target", type=float, default=0.95)
+    op.add_argument("--epochs", type=int, default=3)
+    op.add_argument("--batch", type=int, default=64)
+    op.add_argument("--eval-every", type=int, default=50)
+    op.add_argument("--eval-size", type=int, default=2000)
+    op.add_argument("--seed", type=int, default=0)
+
+    args = parser.parse_args()
+    BENCHMARKS[args.benchmark](args)
+
+
+if __name__ == "__main__":
+    main()
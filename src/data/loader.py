@@ -55,12 +55,14 @@ def preprocess_data(x, y, num_classes=10):
     
     return x, y_onehot
 
-def get_batches(x, y, batch_size):
+def get_batches(x, y, batch_size, start_batch=0):
+    # start_batch skips batches already seen, for resuming mid-epoch with the
+    # RNG state saved before the shuffle
     n_samples = x.shape[0]
     indices = np.arange(n_samples)
     np.random.shuffle(indices)
     
-    for i in range(0, n_samples, batch_size):
+    for i in range(start_batch * batch_size, n_samples, batch_size):
         batch_indices = indices[i:min(i + batch_size, n_samples)]
         yield x[batch_indices], y[batch_indices]
 
@@ -0,0 +1,381 @@
+#!/usr/bin/env python3
+"""
+Load test of the WebSocket broadcast path with simulated classroom clients.
+
+Starts the server (a uvicorn subprocess on localhost by default, in this
+process with --in-process, or uses a running one with --url), connects
+many asyncio WebSocket viewers, some of them deliberately slow readers,
+runs a few HTTP actors calling /start-training, /get-weights and
+/set-learning-rate concurrently, starts training and reports:
+
+- end-to-end update latency percentiles (from the server timestamp in
+  each update to its arrival at the client), per client profile
+- late updates (over --late-ms), updates the server skipped or dropped,
+  and non-update messages some clients never received
+- server CPU, RSS and event-loop lag (from /api/status), plus the
+  harness's own loop lag: if that is high, the harness is the bottleneck
+- HTTP latency and errors per endpoint
+
+Usage (from src/):
+    python loadtest.py --clients 200 --slow 0.2 --duration 30
+    python loadtest.py --url http://localhost:8000 --clients 50 --json report.json
+    python loadtest.py --clients 300 --fail-p99-ms 1000      # exit code 1 on regression
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import numpy as np
+import requests
+import websockets
+
+from serving.monitor import EventLoopMonitor
+from serving.protocol import decode_binary_frame
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+# Message types every client should receive once training runs
+BROADCAST_TYPES = ("pause_moment", "training_complete")
+HTTP_ACTIONS = (
+    ("GET", "/get-weights"),
+    ("POST", "/set-learning-rate?lr=0.01"),
+    ("POST", "/start-training"),
+    ("GET", "/api/status"),
+)
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_until_up(base_url, timeout=60, process=None):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"Server exited with code {process.returncode}")
+        try:
+            if requests.get(base_url + "/health", timeout=1).ok:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"Server at {base_url} did not come up within {timeout}s")
+
+
+def start_subprocess(port, env_overrides):
+    env = dict(os.environ, **env_overrides)
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "server:app", "--app-dir", SRC_DIR,
+         "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        env=env, stdout=subprocess.DEVNULL
+    )
+    return process
+
+
+def start_in_process(port, env_overrides):
+    """uvicorn on a thread of this process; CPU figures then include the harness."""
+    import uvicorn
+    os.environ.update(env_overrides)
+    config = uvicorn.Config("server:app", host="127.0.0.1", port=port, log_level="warning", ws_per_message_deflate=True)
+    server = uvicorn.Server(config)
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    return server, thread
+
+
+class ClientStats:
+    def __init__(self, profile, protocol):
+        self.profile = profile
+        self.protocol = protocol
+        self.connected = False
+        self.error = None
+        self.frames = 0
+        self.updates = 0
+        self.late = 0
+        self.latencies = []
+        self.broadcasts = {t: 0 for t in BROADCAST_TYPES}
+        self.connected_at = None
+
+    def record(self, message, received, late_ms):
+        kind = message.get("type")
+        if kind == "update":
+            self.updates += 1
+            if "time" in message:
+                latency = (received - message["time"]) * 1000
+                self.latencies.append(latency)
+                if latency > late_ms:
+                    self.late += 1
+        elif kind in self.broadcasts:
+            self.broadcasts[kind] += 1
+
+
+def decode_frame(frame):
+    if isinstance(frame, bytes):
+        return decode_binary_frame(frame)
+    message = json.loads(frame)
+    return message["messages"] if message.get("type") == "batch" else [message]
+
+
+async def viewer(ws_url, stats, read_delay, queue, start_delay, stop, late_ms):
+    await asyncio.sleep(start_delay)
+    try:
+        async with websockets.connect(ws_url, max_size=None, max_queue=queue) as ws:
+            stats.connected = True
+            stats.connected_at = time.monotonic()
+            if stats.protocol == "binary":
+                await ws.send(json.dumps({"type": "hello", "protocol": "binary", "precision": "f16"}))
+            while not stop.is_set():
+                try:
+                    frame = await asyncio.wait_for(ws.recv(), timeout=0.5)
+                except asyncio.TimeoutError:
+                    continue
+                received = time.time()
+                stats.frames += 1
+                for message in decode_frame(frame):
+                    stats.record(message, received, late_ms)
+                if read_delay:
+                    # A slow reader: the socket backs up while it "renders"
+                    await asyncio.sleep(read_delay)
+    except Exception as e:
+        stats.error = f"{type(e).__name__}: {e}"
+
+
+async def http_actor(base_url, actions, results, interval, stop, rng, starts):
+    """Calls random actions until stop; appends to starts when it starts a run."""
+    while not stop.is_set():
+        method, path = rng.choice(actions)
+        start = time.perf_counter()
+        try:
+            response = await asyncio.to_thread(requests.request, method, base_url + path, timeout=30)
+            ok = response.ok
+            if path == "/start-training" and ok and response.json().get("status") == "started":
+                starts.append(time.time())
+        except (requests.RequestException, ValueError):
+            ok = False
+        entry = results.setdefault(path.split("?")[0], {"latencies": [], "errors": 0})
+        entry["latencies"].append((time.perf_counter() - start) * 1000)
+        entry["errors"] += not ok
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=rng.uniform(0.5, 1.5) * interval)
+        except asyncio.TimeoutError:
+            pass
+
+
+def server_status(base_url):
+    try:
+        return requests.get(base_url + "/api/status", timeout=10).json()
+    except (requests.RequestException, ValueError):
+        return None
+
+
+def percentiles(values):
+    if not values:
+        return None
+    values = np.asarray(values)
+    return {
+        "count": int(values.size),
+        "p50": round(float(np.percentile(values, 50)), 2),
+        "p90": round(float(np.percentile(values, 90)), 2),
+        "p99": round(float(np.percentile(values, 99)), 2),
+        "max": round(float(values.max()), 2)
+    }
+
+
+async def run_load(args, base_url):
+    ws_url = base_url.replace("http", "ws", 1) + "/ws"
+    rng = random.Random(args.seed)
+    stop = asyncio.Event()
+    harness_monitor = EventLoopMonitor(0.05)
+    harness_monitor.start()
+
+    before = server_status(base_url)
+    if before is None:
+        raise RuntimeError(f"No /api/status at {base_url}")
+    requests.post(f"{base_url}/set-batch-delay?ms={args.batch_delay}", timeout=10)
+    if args.arch:
+        result = requests.post(base_url + "/set-architecture", json={"layers": args.arch}, timeout=30).json()
+        if result.get("status") != "updated":
+            raise RuntimeError(f"/set-architecture failed: {result}")
+
+    n_slow = int(round(args.slow * args.clients))
+    n_binary = int(round(args.binary * args.clients))
+    clients = []
+    tasks = []
+    for i in range(args.clients):
+        slow = i < n_slow
+        # Spread binary clients over both profiles
+        protocol = "binary" if (i * 7919) % args.clients < n_binary else "json"
+        stats = ClientStats("slow" if slow else "fast", protocol)
+        clients.append(stats)
+        delay = args.slow_delay if slow else args.read_delay
+        tasks.append(asyncio.create_task(viewer(
+            ws_url, stats, delay, args.queue, args.ramp * i / max(1, args.clients), stop, args.late_ms
+        )))
+    await asyncio.sleep(args.ramp + 0.5)
+
+    http_results = {}
+    actor_starts = []
+    # --no-train measures the idle broadcast path, so no actor may start a run
+    actions = [a for a in HTTP_ACTIONS if not (args.no_train and a[1] == "/start-training")]
+    tasks.extend(
+        asyncio.create_task(http_actor(
+            base_url, actions, http_results, args.http_interval, stop, random.Random(rng.random()), actor_starts
+        ))
+        for _ in range(args.http_clients)
+    )
+    started_training = False
+    if not args.no_train:
+        response = requests.post(base_url + "/start-training", timeout=30).json()
+        started_training = response.get("status") == "started"
+        print(f"/start-training: {response.get('status')}")
+
+    start_status, started = server_status(base_url), time.monotonic()
+    await asyncio.sleep(args.duration)
+    end_status, elapsed = server_status(base_url), time.monotonic() - started
+    stop.set()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    # Never leave a run going on the server, whoever started it
+    if started_training or actor_starts:
+        try:
+            requests.post(base_url + "/stop-training", timeout=90)
+        except requests.RequestException as e:
+            print(f"/stop-training failed: {e}")
+    await harness_monitor.stop()
+    return build_report(args, clients, http_results, start_status, end_status, elapsed, harness_monitor)
+
+
+def build_report(args, clients, http_results, start_status, end_status, elapsed, harness_monitor):
+    connected = [c for c in clients if c.connected]
+    expected = {t: max((c.broadcasts[t] for c in connected), default=0) for t in BROADCAST_TYPES}
+    report = {
+        "config": {k: v for k, v in vars(args).items() if k != "json"},
+        "seconds": round(elapsed, 2),
+        "clients": {
+            "requested": len(clients),
+            "connected": len(connected),
+            "errors": sorted({c.error for c in clients if c.error})[:5],
+            "error_count": sum(1 for c in clients if c.error)
+        },
+        "latency_ms": {},
+        "updates_per_second": {},
+        "late": sum(c.late for c in clients),
+        # Non-update messages are never coalesced away, so every client should get them all
+        "missing_broadcasts": sum(expected[t] - c.broadcasts[t] for c in connected for t in BROADCAST_TYPES),
+        "http": {path: dict(percentiles(r["latencies"]), errors=r["errors"]) for path, r in http_results.items()},
+        "harness_loop": harness_monitor.stats()
+    }
+    for profile in ("fast", "slow", "all"):
+        group = [c for c in connected if profile == "all" or c.profile == profile]
+        if group:
+            report["latency_ms"][profile] = percentiles([x for c in group for x in c.latencies])
+            report["updates_per_second"][profile] = round(sum(c.updates for c in group) / len(group) / elapsed, 2)
+    if start_status and end_status:
+        ws_start, ws_end = start_status["websocket"], end_status["websocket"]
+        report["server"] = {
+            "dropped": ws_end["dropped"] - ws_start["dropped"],
+            "skipped_updates": ws_end["skipped_updates"] - ws_start["skipped_updates"],
+            "bytes_sent": ws_end["bytes_sent"] - ws_start["bytes_sent"],
+            "cpu_percent": round(100 * (end_status["cpu_seconds"] - start_status["cpu_seconds"]) / elapsed, 1),
+            "rss": end_status.get("memory", {}).get("rss"),
+            "event_loop": end_status.get("event_loop")
+        }
+    return report
+
+
+def print_report(report):
+    clients = report["clients"]
+    config = report["config"]
+    print(f"\n{clients['connected']}/{clients['requested']} clients connected "
+          f"({round(config['slow'] * config['clients'])} slow at {config['slow_delay']}s per frame, "
+          f"{round(config['binary'] * config['clients'])} binary) for {report['seconds']}s")
+    for error in clients["errors"]:
+        print(f"  client error: {error}")
+    print(f"\n{'updates':<8}{'per s':>8}{'count':>9}{'p50 ms':>9}{'p90 ms':>9}{'p99 ms':>9}{'max ms':>9}")
+    for profile, stats in report["latency_ms"].items():
+        if stats:
+            print(f"{profile:<8}{report['updates_per_second'][profile]:>8}{stats['count']:>9}"
+                  f"{stats['p50']:>9}{stats['p90']:>9}{stats['p99']:>9}{stats['max']:>9}")
+    print(f"late (> {config['late_ms']} ms): {report['late']}, missing broadcasts: {report['missing_broadcasts']}")
+    server = report.get("server")
+    if server:
+        loop = server["event_loop"] or {}
+        rss = f"{server['rss'] / 2 ** 20:.0f} MB" if server["rss"] else "n/a"
+        print(f"server: CPU {server['cpu_percent']}% of a core, RSS {rss}, "
+              f"{server['bytes_sent'] / 2 ** 20:.1f} MB sent, {server['skipped_updates']} updates skipped, "
+              f"{server['dropped']} dropped")
+        print(f"server event loop lag: mean {loop.get('mean_ms')} ms, p99 {loop.get('p99_ms')} ms, max {loop.get('max_ms')} ms")
+    harness = report["harness_loop"]
+    print(f"harness event loop lag: p99 {harness.get('p99_ms')} ms, max {harness.get('max_ms')} ms")
+    if report["http"]:
+        print(f"\n{'http':<20}{'calls':>7}{'errors':>8}{'p50 ms':>9}{'p99 ms':>9}")
+        for path, stats in sorted(report["http"].items()):
+            print(f"{path:<20}{stats['count']:>7}{stats['errors']:>8}{stats['p50']:>9}{stats['p99']:>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="Use a running server instead of starting one")
+    parser.add_argument("--in-process", action="store_true", help="Run the server on a thread of this process")
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE", help="Environment for a started server")
+    parser.add_argument("--clients", type=int, default=100)
+    parser.add_argument("--slow", type=float, default=0.2, help="Fraction of slow readers")
+    parser.add_argument("--slow-delay", type=float, default=0.5, help="Seconds a slow reader spends per frame")
+    parser.add_argument("--read-delay", type=float, default=0.0, help="Seconds other readers spend per frame")
+    parser.add_argument("--binary", type=float, default=0.5, help="Fraction of clients using the binary protocol")
+    parser.add_argument("--queue", type=int, default=4, help="Frames a client buffers before the socket backs up")
+    parser.add_argument("--ramp", type=float, default=2.0, help="Seconds over which clients connect")
+    parser.add_argument("--http-clients", type=int, default=4)
+    parser.add_argument("--http-interval", type=float, default=1.0, help="Mean seconds between an actor's calls")
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds of measurement after training starts")
+    parser.add_argument("--batch-delay", type=int, default=0, help="Server batch delay in ms")
+    parser.add_argument("--arch", type=json.loads, default=None, help="JSON architecture to train")
+    parser.add_argument("--no-train", action="store_true", help="Don't start training (idle broadcast path)")
+    parser.add_argument("--late-ms", type=float, default=500.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Also write the report to this file")
+    parser.add_argument("--fail-p99-ms", type=float, default=None, help="Exit with 1 if the p99 update latency exceeds this")
+    args = parser.parse_args()
+
+    env = dict(item.split("=", 1) for item in args.env)
+    process = None
+    server = None
+    if args.url:
+        base_url = args.url.rstrip("/")
+    else:
+        port = free_port()
+        base_url = f"http://127.0.0.1:{port}"
+        if args.in_process:
+            server, _ = start_in_process(port, env)
+        else:
+            process = start_subprocess(port, env)
+    try:
+        wait_until_up(base_url, process=process)
+        report = asyncio.run(run_load(args, base_url))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=10)
+        if server is not None:
+            server.should_exit = True
+
+    print_report(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    p99 = (report["latency_ms"].get("all") or {}).get("p99")
+    if args.fail_p99_ms is not None and (p99 is None or p99 > args.fail_p99_ms):
+        print(f"FAIL: p99 update latency {p99} ms exceeds {args.fail_p99_ms} ms")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,4 +1,7 @@
-from .layers import Dense, ReLU, Sigmoid, Softmax
+from .layers import Dense, SparseDense, Reshape, Flatten, ReLU, Sigmoid, Softmax
+from .conv import Conv2D, MaxPool2D
 from .loss import CrossEntropy
-from .optimizer import SGD
+from .optimizer import SGD, Adam, AdamW, RMSProp
+from .schedules import Schedule, StepDecay, CosineDecay, EarlyStopping, make_schedule
 from .model import NeuralNetwork
+from .builder import build_network
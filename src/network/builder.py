@@ -0,0 +1,83 @@
+import math
+
+from .layers import Dense, Reshape, Flatten, ReLU, Softmax
+from .conv import Conv2D, MaxPool2D, output_size
+from .model import NeuralNetwork
+
+def _is_count(value, minimum=1):
+    # bool is an int subclass, but True is not a layer width
+    return isinstance(value, int) and not isinstance(value, bool) and value >= minimum
+
+def _spec_int(spec, key, default, minimum=1):
+    value = spec.get(key)
+    value = default if value is None else value
+    if not _is_count(value, minimum):
+        raise ValueError(f"{spec.get('type')} '{key}' must be an integer >= {minimum}, got {value!r}")
+    return value
+
+def plan_network(layer_sizes):
+    """
+    The layers build_network() would create, as (class, constructor
+    kwargs, per-sample output shape) tuples, without allocating any
+    weights. Raises ValueError for invalid architectures.
+    """
+    if len(layer_sizes) < 2 or not _is_count(layer_sizes[0]) or not _is_count(layer_sizes[-1]):
+        raise ValueError("The first and last layers must be positive integer widths")
+    plan = []
+    shape = (layer_sizes[0],)
+    for i, spec in enumerate(layer_sizes[1:]):
+        is_output = i == len(layer_sizes) - 2
+        if isinstance(spec, dict):
+            if len(shape) == 1:
+                side = math.isqrt(shape[0])
+                if side * side != shape[0]:
+                    raise ValueError(f"Convolutions need a square image input, got {shape[0]} values")
+                shape = (side, side, 1)
+                plan.append((Reshape, {'shape': shape}, shape))
+            kind = spec.get("type")
+            if kind == "conv":
+                if "filters" not in spec:
+                    raise ValueError("Conv layers need a 'filters' count")
+                kwargs = {
+                    'in_channels': shape[2],
+                    'out_channels': _spec_int(spec, "filters", None),
+                    'kernel_size': _spec_int(spec, "kernel", 3),
+                    'stride': _spec_int(spec, "stride", 1),
+                    'padding': _spec_int(spec, "padding", 0, minimum=0)
+                }
+                k, s, p = kwargs['kernel_size'], kwargs['stride'], kwargs['padding']
+                shape = (output_size(shape[0], k, s, p), output_size(shape[1], k, s, p), kwargs['out_channels'])
+                plan.extend([(Conv2D, kwargs, shape), (ReLU, {}, shape)])
+            elif kind == "pool":
+                size = _spec_int(spec, "size", 2)
+                stride = _spec_int(spec, "stride", size)
+                shape = (output_size(shape[0], size, stride), output_size(shape[1], size, stride), shape[2])
+                plan.append((MaxPool2D, {'pool_size': size, 'stride': stride}, shape))
+            else:
+                raise ValueError(f"Unknown layer type: {kind}")
+            if min(shape) < 1:
+                raise ValueError(f"Layer {i + 1} ({kind}) leaves nothing of the image")
+            continue
+        if not _is_count(spec):
+            raise ValueError(f"Layer {i + 1} must be a positive integer width or a conv/pool spec, got {spec!r}")
+        if len(shape) == 3:
+            shape = (shape[0] * shape[1] * shape[2],)
+            plan.append((Flatten, {}, shape))
+        kwargs = {'input_size': shape[0], 'output_size': spec, 'init_type': 'xavier' if is_output else 'he'}
+        shape = (spec,)
+        plan.extend([(Dense, kwargs, shape), (Softmax if is_output else ReLU, {}, shape)])
+    return plan
+
+def build_network(layer_sizes):
+    """
+    Build the visualizer's network from a list of layer widths, e.g. [784, 128, 64, 10]:
+    Dense + ReLU for hidden layers (He init), Dense + Softmax on top (Xavier init).
+
+    Hidden entries may also be dicts describing convolutional layers on the
+    (square, single-channel) input image:
+        {"type": "conv", "filters": 8, "kernel": 3, "stride": 1, "padding": 1}  (+ ReLU)
+        {"type": "pool", "size": 2, "stride": 2}
+    e.g. [784, {"type": "conv", "filters": 8}, {"type": "pool"}, 64, 10].
+    Reshape/Flatten layers are inserted where needed.
+    """
+    return NeuralNetwork([cls(**kwargs) for cls, kwargs, _ in plan_network(layer_sizes)])
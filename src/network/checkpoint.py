@@ -0,0 +1,221 @@
+"""
+Training checkpoints.
+
+A checkpoint is one uncompressed .npz file holding every layer's state
+arrays (parameters and SGD momentum buffers), the optimizer's own buffers
+(Adam/RMSProp moments) and step count, the NumPy RNG state captured
+at the start of the current epoch, and a JSON "__meta__" entry with the
+layer stack, optimizer settings and position (epoch, batches done in it).
+Restoring the RNG state re-creates the epoch's shuffle, and skipping the
+batches already done continues the run exactly where it stopped.
+
+CheckpointWriter writes snapshots on a background thread. The training
+thread only copies the arrays (snapshot()) and hands them over, so it never
+waits for the disk.
+"""
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+from .layers import Dense, SparseDense, Reshape, Flatten, ReLU, Sigmoid, Softmax
+from .conv import Conv2D, MaxPool2D
+from .model import NeuralNetwork
+from .optimizer import SGD, Adam, AdamW, RMSProp
+
+FORMAT_VERSION = 1
+EXTENSION = ".npz"
+
+# Types that can be rebuilt from a checkpoint, by class name
+LAYER_TYPES = {
+    cls.__name__: cls
+    for cls in (Dense, SparseDense, Conv2D, MaxPool2D, Reshape, Flatten, ReLU, Sigmoid, Softmax)
+}
+OPTIMIZER_TYPES = {cls.__name__: cls for cls in (SGD, Adam, AdamW, RMSProp)}
+
+def snapshot(network, optimizer, epoch, batch, rng_state, extra=None):
+    """
+    Copy everything a checkpoint needs. This is one memcpy per array, cheap
+    enough to run on the training thread between batches.
+
+    epoch is 0-based, batch is the number of batches already done in that
+    epoch and rng_state is np.random.get_state() from before its shuffle.
+    """
+    arrays = {}
+    for i, layer_state in enumerate(network.get_state()):
+        for key, value in layer_state.items():
+            arrays[f"layer{i}.{key}"] = value
+    for key, value in optimizer.get_state().items():
+        arrays[f"optimizer.{key}"] = value
+    name, keys, pos, has_gauss, cached_gaussian = rng_state
+    arrays["rng.keys"] = np.array(keys, copy=True)
+    meta = {
+        "format": FORMAT_VERSION,
+        "layers": [{"type": type(layer).__name__, "config": layer.get_config()} for layer in network.layers],
+        "optimizer": {
+            "type": type(optimizer).__name__,
+            "config": optimizer.get_config(),
+            "iterations": optimizer.iterations
+        },
+        "epoch": int(epoch),
+        "batch": int(batch),
+        "rng": [name, int(pos), int(has_gauss), float(cached_gaussian)],
+        "created": time.time(),
+        "extra": extra or {}
+    }
+    return {"meta": meta, "arrays": arrays}
+
+def save_checkpoint(path, snap):
+    """Write a snapshot to path; the file is replaced atomically."""
+    meta = np.frombuffer(json.dumps(snap["meta"]).encode("utf-8"), dtype=np.uint8)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        np.savez(f, __meta__=meta, **snap["arrays"])
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+def load_checkpoint(path):
+    with np.load(path, allow_pickle=False) as data:
+        meta = json.loads(data["__meta__"].tobytes().decode("utf-8"))
+        arrays = {key: data[key] for key in data.files if key != "__meta__"}
+    if meta.get("format") != FORMAT_VERSION:
+        raise ValueError(f"Unsupported checkpoint format {meta.get('format')} in {path}")
+    return {"meta": meta, "arrays": arrays}
+
+def restore(snap):
+    """
+    Rebuild (network, optimizer, rng_state) from a loaded checkpoint.
+    Pass rng_state to np.random.set_state() before resuming the epoch.
+    """
+    meta, arrays = snap["meta"], snap["arrays"]
+    layers = []
+    for spec in meta["layers"]:
+        cls = LAYER_TYPES.get(spec["type"])
+        if cls is None:
+            raise ValueError(f"Unknown layer type in checkpoint: {spec['type']}")
+        layers.append(cls(**spec["config"]))
+    network = NeuralNetwork(layers)
+    network.set_state([
+        {key: arrays[f"layer{i}.{key}"] for key in layer.state_keys}
+        for i, layer in enumerate(layers)
+    ])
+
+    spec = meta["optimizer"]
+    cls = OPTIMIZER_TYPES.get(spec["type"])
+    if cls is None:
+        raise ValueError(f"Unknown optimizer type in checkpoint: {spec['type']}")
+    optimizer = cls(**spec["config"])
+    optimizer.iterations = spec.get("iterations", 0)
+    optimizer.set_state({
+        key[len("optimizer."):]: value for key, value in arrays.items() if key.startswith("optimizer.")
+    })
+
+    name, pos, has_gauss, cached_gaussian = meta["rng"]
+    rng_state = (name, arrays["rng.keys"], pos, has_gauss, cached_gaussian)
+    return network, optimizer, rng_state
+
+class CheckpointWriter:
+    """
+    Writes snapshots to a directory on a background thread and keeps only
+    the newest `keep` files.
+
+    submit() never blocks: if the previous snapshot is still being written,
+    a newer one replaces whatever is waiting (only the latest matters).
+    """
+    def __init__(self, directory, keep=3, prefix="checkpoint"):
+        self.directory = directory
+        self.keep = keep
+        self.prefix = prefix
+        self._pending = None
+        self._busy = False
+        self._cond = threading.Condition()
+        self._thread = None
+        self.written = 0
+        self.superseded = 0
+        self.last_path = None
+        self.last_write_ms = None
+        self.last_error = None
+
+    def submit(self, snap):
+        with self._cond:
+            if self._pending is not None:
+                self.superseded += 1
+            self._pending = snap
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="checkpoint-writer", daemon=True)
+                self._thread.start()
+            self._cond.notify_all()
+
+    def flush(self, timeout=None):
+        """Wait until every submitted snapshot is on disk."""
+        with self._cond:
+            return self._cond.wait_for(lambda: self._pending is None and not self._busy, timeout)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending is not None)
+                snap, self._pending = self._pending, None
+                self._busy = True
+            try:
+                start = time.perf_counter()
+                os.makedirs(self.directory, exist_ok=True)
+                path = os.path.join(self.directory, self.filename(snap["meta"]))
+                save_checkpoint(path, snap)
+                self.last_write_ms = round(1000 * (time.perf_counter() - start), 2)
+                self.last_path = path
+                self.last_error = None
+                self.written += 1
+                self._apply_retention()
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"Checkpoint write failed: {e}")
+            finally:
+                with self._cond:
+                    self._busy = False
+                    self._cond.notify_all()
+
+    def filename(self, meta):
+        # Millisecond timestamp first so names sort oldest to newest
+        return f"{self.prefix}-{int(meta['created'] * 1000):013d}-e{meta['epoch']}-b{meta['batch']}{EXTENSION}"
+
+    def list_checkpoints(self):
+        """Checkpoint file names, oldest first."""
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return []
+        return sorted(n for n in names if n.startswith(self.prefix + "-") and n.endswith(EXTENSION))
+
+    def latest(self):
+        names = self.list_checkpoints()
+        return os.path.join(self.directory, names[-1]) if names else None
+
+    def _apply_retention(self):
+        names = self.list_checkpoints()
+        for name in names[:max(0, len(names) - self.keep)]:
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
+
+    def stats(self):
+        return {
+            "directory": self.directory,
+            "keep": self.keep,
+            "written": self.written,
+            "superseded": self.superseded,
+            "last": os.path.basename(self.last_path) if self.last_path else None,
+            "last_write_ms": self.last_write_ms,
+            "last_error": self.last_error,
+            "pending_bytes": self.pending_bytes()
+        }
+
+    def pending_bytes(self):
+        """Bytes of the snapshot waiting to be written (it holds copies of every array)."""
+        with self._cond:
+            snap = self._pending
+        return sum(a.nbytes for a in snap["arrays"].values()) if snap else 0
@@ -0,0 +1,170 @@
+"""
+Convolution and max-pooling layers on NHWC images (batch, height, width,
+channels); use Reshape in front of the first one and Flatten before Dense.
+
+Both are vectorized through im2col: sliding_windows() exposes every
+receptive field as a read-only strided view of the input, so a
+convolution is one GEMM of the (batch * positions, kernel * channels)
+window matrix with the (kernel * channels, filters) weights. col2im() adds
+window gradients back into the image with one vectorized add per kernel
+offset, never looping over pixels or samples.
+"""
+import numpy as np
+from numpy.lib.stride_tricks import as_strided
+
+from .layers import Layer
+
+def output_size(size, kernel, stride, padding=0):
+    return (size + 2 * padding - kernel) // stride + 1
+
+def sliding_windows(x, kh, kw, stride):
+    """Read-only (N, OH, OW, KH, KW, C) view of every window of x (N, H, W, C)."""
+    n, h, w, c = x.shape
+    oh, ow = output_size(h, kh, stride), output_size(w, kw, stride)
+    sn, sh, sw, sc = x.strides
+    return as_strided(
+        x, shape=(n, oh, ow, kh, kw, c),
+        strides=(sn, sh * stride, sw * stride, sh, sw, sc),
+        writeable=False
+    )
+
+def col2im(cols, x_shape, stride):
+    """
+    Inverse of sliding_windows() for gradients: sums cols (N, OH, OW, KH,
+    KW, C) into an array of x_shape, adding overlapping windows together.
+    """
+    dx = np.zeros(x_shape, dtype=cols.dtype)
+    _, oh, ow, kh, kw, _ = cols.shape
+    for i in range(kh):
+        for j in range(kw):
+            dx[:, i:i + stride * oh:stride, j:j + stride * ow:stride, :] += cols[:, :, :, i, j, :]
+    return dx
+
+class Conv2D(Layer):
+    """
+    2D convolution: weights (KH, KW, C_in, C_out), bias (1, C_out).
+    Trained by SGD like Dense (same weights/bias/momentum attributes).
+    """
+    state_keys = ('weights', 'bias', 'weights_m', 'bias_m')
+    trainable = True
+
+    def __init__(self, in_channels, out_channels, kernel_size=3, stride=1, padding=0, init_type='he'):
+        super().__init__()
+        self.kernel_size = kernel_size
+        self.stride = stride
+        self.padding = padding
+        fan_in = kernel_size * kernel_size * in_channels
+        shape = (kernel_size, kernel_size, in_channels, out_channels)
+        if init_type == 'xavier':
+            limit = np.sqrt(6 / (fan_in + kernel_size * kernel_size * out_channels))
+            self.weights = np.random.uniform(-limit, limit, shape)
+        else:
+            self.weights = np.random.normal(0, np.sqrt(2 / fan_in), shape)
+        self.bias = np.zeros((1, out_channels))
+        self.weights_grad = None
+        self.bias_grad = None
+        self.weights_m = np.zeros_like(self.weights)
+        self.bias_m = np.zeros_like(self.bias)
+        self._cols = None
+
+    def get_config(self):
+        return {
+            'in_channels': self.weights.shape[2],
+            'out_channels': self.weights.shape[3],
+            'kernel_size': self.kernel_size,
+            'stride': self.stride,
+            'padding': self.padding
+        }
+
+    def output_shape(self, input_shape):
+        h, w, _ = input_shape
+        return (
+            output_size(h, self.kernel_size, self.stride, self.padding),
+            output_size(w, self.kernel_size, self.stride, self.padding),
+            self.weights.shape[3]
+        )
+
+    def _pad(self, x):
+        if not self.padding:
+            return x
+        p = self.padding
+        return np.pad(x, ((0, 0), (p, p), (p, p), (0, 0)))
+
+    def _convolve(self, x):
+        windows = sliding_windows(self._pad(x), self.kernel_size, self.kernel_size, self.stride)
+        n, oh, ow = windows.shape[:3]
+        # im2col: the reshape copies the strided view into a contiguous matrix
+        cols = windows.reshape(n * oh * ow, -1)
+        output = cols @ self.weights.reshape(cols.shape[1], -1)
+        output += self.bias
+        return cols, output.reshape(n, oh, ow, -1)
+
+    def forward(self, input_data):
+        self.input = input_data
+        self._cols, self.output = self._convolve(input_data)
+        return self.output
+
+    def infer(self, input_data):
+        return self._convolve(input_data)[1]
+
+    def backward(self, output_gradient, learning_rate):
+        n, oh, ow, filters = output_gradient.shape
+        grad = output_gradient.reshape(-1, filters)
+        weights_2d = self.weights.reshape(-1, filters)
+
+        self.weights_grad = (self._cols.T @ grad).reshape(self.weights.shape)
+        self.bias_grad = grad.sum(axis=0, keepdims=True)
+
+        kh, kw, channels, _ = self.weights.shape
+        cols_grad = (grad @ weights_2d.T).reshape(n, oh, ow, kh, kw, channels)
+        _, h, w, _ = self.input.shape
+        p = self.padding
+        padded_grad = col2im(cols_grad, (n, h + 2 * p, w + 2 * p, channels), self.stride)
+        return padded_grad[:, p:p + h, p:p + w, :]
+
+class MaxPool2D(Layer):
+    """Max pooling over pool_size x pool_size windows (stride defaults to pool_size)."""
+
+    def __init__(self, pool_size=2, stride=None):
+        super().__init__()
+        self.pool_size = pool_size
+        self.stride = stride or pool_size
+        self._argmax = None
+
+    def get_config(self):
+        return {'pool_size': self.pool_size, 'stride': self.stride}
+
+    def output_shape(self, input_shape):
+        h, w, c = input_shape
+        return output_size(h, self.pool_size, self.stride), output_size(w, self.pool_size, self.stride), c
+
+    def _argmax_pool(self, x):
+        windows = sliding_windows(x, self.pool_size, self.pool_size, self.stride)
+        n, oh, ow, kh, kw, c = windows.shape
+        flat = windows.reshape(n, oh, ow, kh * kw, c)
+        argmax = flat.argmax(axis=3)
+        output = np.take_along_axis(flat, argmax[:, :, :, None, :], axis=3)[:, :, :, 0, :]
+        return argmax, output
+
+    def forward(self, input_data):
+        self.input = input_data
+        self._argmax, self.output = self._argmax_pool(input_data)
+        return self.output
+
+    def infer(self, input_data):
+        # Without argmax: an elementwise maximum per kernel offset beats
+        # reducing over the short, strided window axes
+        windows = sliding_windows(input_data, self.pool_size, self.pool_size, self.stride)
+        output = windows[:, :, :, 0, 0, :].copy()
+        for i in range(self.pool_size):
+            for j in range(self.pool_size):
+                np.maximum(output, windows[:, :, :, i, j, :], out=output)
+        return output
+
+    def backward(self, output_gradient, learning_rate):
+        n, oh, ow, c = output_gradient.shape
+        k = self.pool_size
+        # Route each output gradient to the position that won the max
+        cols_grad = np.zeros((n, oh, ow, k * k, c), dtype=output_gradient.dtype)
+        np.put_along_axis(cols_grad, self._argmax[:, :, :, None, :], output_gradient[:, :, :, None, :], axis=3)
+        return col2im(cols_grad.reshape(n, oh, ow, k, k, c), self.input.shape, self.stride)
@@ -2,6 +2,12 @@ import numpy as np
 from .activations import relu, relu_derivative, sigmoid, sigmoid_derivative, softmax
 
 class Layer:
+    # Arrays that make up the layer's trainable state (parameters and
+    # optimizer buffers), see NeuralNetwork.get_state()
+    state_keys = ()
+    # Whether the optimizer updates weights/bias from weights_grad/bias_grad
+    trainable = False
+
     def __init__(self):
         self.input = None
         self.output = None
@@ -12,10 +18,21 @@ class Layer:
     def backward(self, output_error, learning_rate):
         raise NotImplementedError
 
+    def infer(self, input_data):
+        """Forward pass that does not cache anything on the layer."""
+        raise NotImplementedError
+
+    def get_config(self):
+        """Constructor arguments needed to rebuild the layer (see checkpoint.py)."""
+        return {}
+
 class Dense(Layer):
     """
     Fully connected layer: y = Wx + b
     """
+    state_keys = ('weights', 'bias', 'weights_m', 'bias_m')
+    trainable = True
+
     def __init__(self, input_size, output_size, init_type='he'):
         super().__init__()
         self.weight_init(input_size, output_size, init_type)
@@ -29,6 +46,9 @@ class Dense(Layer):
         self.weights_m = np.zeros_like(self.weights)
         self.bias_m = np.zeros_like(self.bias)
 
+    def get_config(self):
+        return {'input_size': self.weights.shape[0], 'output_size': self.weights.shape[1]}
+
     def weight_init(self, input_size, output_size, init_type):
         if init_type == 'xavier':
             # Xavier/Glorot initialization for Sigmoid/Tanh
@@ -44,6 +64,9 @@ class Dense(Layer):
         self.output = np.dot(self.input, self.weights) + self.bias
         return self.output
 
+    def infer(self, input_data):
+        return np.dot(input_data, self.weights) + self.bias
+
     def backward(self, output_gradient, learning_rate):
         # output_gradient is dL/dY
         # dL/dW = X.T * dL/dY
@@ -61,6 +84,96 @@ class Dense(Layer):
         
         return input_gradient
 
+class SparseDense(Layer):
+    """
+    Fully connected layer with pruned weights, for inference.
+
+    The weights are stored as CSR of W.T, one row per output unit: output j
+    gets data[indptr[j]:indptr[j+1]] times the inputs listed in the same
+    slice of indices. Build it with SparseDense.from_dense(); fine-tune the
+    pruned Dense layer (see pruning.py) before converting.
+    """
+    state_keys = ('data', 'indices', 'indptr', 'bias')
+
+    def __init__(self, input_size, output_size, nnz=0):
+        super().__init__()
+        self.input_size = input_size
+        self.data = np.zeros(nnz)
+        self.indices = np.zeros(nnz, dtype=np.int32)
+        self.indptr = np.zeros(output_size + 1, dtype=np.int64)
+        self.bias = np.zeros((1, output_size))
+
+    @classmethod
+    def from_dense(cls, layer):
+        weights_t = layer.weights.T
+        rows, cols = np.nonzero(weights_t)
+        sparse = cls(layer.weights.shape[0], layer.weights.shape[1], len(rows))
+        sparse.data[:] = weights_t[rows, cols]
+        sparse.indices[:] = cols
+        sparse.indptr[1:] = np.cumsum(np.bincount(rows, minlength=weights_t.shape[0]))
+        sparse.bias[...] = layer.bias
+        return sparse
+
+    def to_dense(self):
+        weights = np.zeros((self.input_size, self.bias.shape[1]))
+        outputs = np.repeat(np.arange(self.bias.shape[1]), np.diff(self.indptr))
+        weights[self.indices, outputs] = self.data
+        return weights
+
+    @property
+    def density(self):
+        return self.data.size / max(1, self.input_size * self.bias.shape[1])
+
+    def get_config(self):
+        return {'input_size': self.input_size, 'output_size': self.bias.shape[1], 'nnz': self.data.size}
+
+    def forward(self, input_data):
+        self.input = input_data
+        self.output = self.infer(input_data)
+        return self.output
+
+    def infer(self, input_data):
+        output = np.repeat(self.bias, input_data.shape[0], axis=0)
+        if self.data.size:
+            # One gather + multiply over all nonzeros, then a segmented sum
+            # per output unit; units without weights keep just the bias
+            products = input_data[:, self.indices] * self.data
+            starts = self.indptr[:-1]
+            nonempty = np.flatnonzero(self.indptr[1:] > starts)
+            output[:, nonempty] += np.add.reduceat(products, starts[nonempty], axis=1)
+        return output
+
+    def backward(self, output_gradient, learning_rate):
+        raise NotImplementedError("SparseDense is inference-only; fine-tune the pruned Dense layer instead")
+
+class Reshape(Layer):
+    """Reshape each sample, e.g. Reshape((28, 28, 1)) in front of Conv2D."""
+    def __init__(self, shape):
+        super().__init__()
+        self.shape = tuple(shape)
+
+    def get_config(self):
+        return {'shape': list(self.shape)}
+
+    def forward(self, input_data):
+        self.input = input_data
+        self.output = self.infer(input_data)
+        return self.output
+
+    def infer(self, input_data):
+        return input_data.reshape((input_data.shape[0],) + self.shape)
+
+    def backward(self, output_gradient, learning_rate):
+        return output_gradient.reshape(self.input.shape)
+
+class Flatten(Reshape):
+    """Flatten each sample to a vector, e.g. between MaxPool2D and Dense."""
+    def __init__(self):
+        super().__init__((-1,))
+
+    def get_config(self):
+        return {}
+
 class ActivationLayer(Layer):
     def __init__(self, activation, activation_derivative):
         super().__init__()
@@ -72,6 +185,9 @@ class ActivationLayer(Layer):
         self.output = self.activation(self.input)
         return self.output
 
+    def infer(self, input_data):
+        return self.activation(input_data)
+
     def backward(self, output_gradient, learning_rate):
         # dL/dX = dL/dY * f'(X)
         return output_gradient * self.activation_derivative(self.input)
@@ -94,6 +210,9 @@ class Softmax(Layer):
         self.output = softmax(input_data)
         return self.output
 
+    def infer(self, input_data):
+        return softmax(input_data)
+
     def backward(self, output_gradient, learning_rate):
         # This implementation assumes the gradient comes from a source that 
         # hasn't already combined softmax and cross-entropy.
@@ -4,6 +4,9 @@ class NeuralNetwork:
     def __init__(self, layers=None):
         self.layers = layers if layers is not None else []
         self.hooks = []
+        # Parameter version, bumped on every weight update so that cached
+        # snapshots of the weights can be keyed by it.
+        self.version = 0
 
     def add(self, layer):
         self.layers.append(layer)
@@ -26,7 +29,11 @@ class NeuralNetwork:
             current_gradient = layer.backward(current_gradient, learning_rate)
         return current_gradient
 
-    def train_step(self, x_batch, y_batch, loss_fn, optimizer):
+    def train_step(self, x_batch, y_batch, loss_fn, optimizer, schedule=None):
+        """schedule: optional callable step -> learning rate (see schedules.py)."""
+        if schedule is not None:
+            optimizer.learning_rate = schedule(optimizer.iterations)
+
         # 1. Forward pass
         y_pred = self.forward(x_batch)
         
@@ -41,15 +48,56 @@ class NeuralNetwork:
         
         # 5. Optimize
         optimizer.update(self.layers)
+        self.version += 1
         
         # 6. Call hooks for visualization
         self._trigger_hooks(x_batch, y_batch, y_pred, loss_val)
         
         return loss_val, y_pred
 
+    def get_state(self):
+        """Copies of every layer's state arrays, one dict per layer."""
+        return [
+            {key: getattr(layer, key).copy() for key in layer.state_keys}
+            for layer in self.layers
+        ]
+
+    def set_state(self, state):
+        """Inverse of get_state(); the architecture must match."""
+        if len(state) != len(self.layers):
+            raise ValueError(f"State has {len(state)} layers, network has {len(self.layers)}")
+        for layer, arrays in zip(self.layers, state):
+            for key, value in arrays.items():
+                current = getattr(layer, key)
+                if current.shape != value.shape:
+                    raise ValueError(f"Shape mismatch for {type(layer).__name__}.{key}: {current.shape} vs {value.shape}")
+                current[...] = value
+        self.bump_version()
+
+    def bump_version(self):
+        """Call after changing parameters outside of train_step."""
+        self.version += 1
+        return self.version
+
     def predict(self, input_data):
         return self.forward(input_data)
 
+    def infer(self, input_data, return_activations=False):
+        """
+        Stateless forward pass for serving: unlike forward(), it leaves the
+        layers' cached input/output alone, so it is safe to call while
+        another thread is training the same network.
+        """
+        activations = []
+        current_data = input_data
+        for layer in self.layers:
+            current_data = layer.infer(current_data)
+            if return_activations:
+                activations.append(current_data)
+        if return_activations:
+            return current_data, activations
+        return current_data
+
     def _trigger_hooks(self, x, y, y_pred, loss):
         for hook in self.hooks:
             hook(self, x, y, y_pred, loss)
@@ -1,27 +1,183 @@
 import numpy as np
-from .layers import Dense
 
 class Optimizer:
     def __init__(self, learning_rate=0.01):
         self.learning_rate = learning_rate
+        # Number of update() calls so far (the step passed to LR schedules)
+        self.iterations = 0
 
     def update(self, layers):
         raise NotImplementedError
 
+    def get_config(self):
+        """Constructor arguments, stored in checkpoints."""
+        return {'learning_rate': self.learning_rate}
+
+    def get_state(self):
+        """Copies of the optimizer's own buffers, keyed by name (see checkpoint.py)."""
+        return {}
+
+    def set_state(self, state):
+        """Inverse of get_state()."""
+
 class SGD(Optimizer):
     def __init__(self, learning_rate=0.01, momentum=0.0):
         super().__init__(learning_rate)
         self.momentum = momentum
 
+    def get_config(self):
+        return dict(super().get_config(), momentum=self.momentum)
+
     def update(self, layers):
+        self.iterations += 1
         for layer in layers:
-            if isinstance(layer, Dense):
+            if layer.trainable:
                 # Update weights with momentum
                 # v = m * v - lr * grad
                 # w = w + v
                 layer.weights_m = self.momentum * layer.weights_m - self.learning_rate * layer.weights_grad
                 layer.weights += layer.weights_m
-                
+
                 # Update biases with momentum
                 layer.bias_m = self.momentum * layer.bias_m - self.learning_rate * layer.bias_grad
                 layer.bias += layer.bias_m
+
+class AdaptiveOptimizer(Optimizer):
+    """
+    Base for optimizers with per-parameter moment buffers (Adam, RMSProp).
+
+    Buffers live on the optimizer, keyed "layer{i}.weights" / "layer{i}.bias"
+    by position in the layer list, and are allocated on the first update.
+    Updates run in place with NumPy out= arguments on those buffers plus
+    one shared scratch array, so a step allocates nothing.
+    """
+    slots = ()
+
+    def __init__(self, learning_rate=0.001, epsilon=1e-8):
+        super().__init__(learning_rate)
+        self.epsilon = epsilon
+        self.buffers = {}
+        self._scratch = np.zeros(0)
+
+    def get_config(self):
+        return dict(super().get_config(), epsilon=self.epsilon)
+
+    def parameters(self, layers):
+        """(key, parameter, gradient) for every trainable array."""
+        for i, layer in enumerate(layers):
+            if layer.trainable:
+                yield f"layer{i}.weights", layer.weights, layer.weights_grad
+                yield f"layer{i}.bias", layer.bias, layer.bias_grad
+
+    def _buffers_for(self, key, param):
+        buffers = self.buffers.get(key)
+        if buffers is None or buffers[0].shape != param.shape:
+            buffers = self.buffers[key] = tuple(np.zeros_like(param) for _ in self.slots)
+        return buffers
+
+    def _scratch_like(self, param):
+        # One flat buffer sized for the largest parameter, viewed per parameter
+        if self._scratch.size < param.size or self._scratch.dtype != param.dtype:
+            self._scratch = np.empty(param.size, dtype=param.dtype)
+        return self._scratch[:param.size].reshape(param.shape)
+
+    def update(self, layers):
+        self.iterations += 1
+        for key, param, grad in self.parameters(layers):
+            self.apply(param, grad, self._buffers_for(key, param), self._scratch_like(param), key.endswith('.weights'))
+
+    def apply(self, param, grad, buffers, scratch, is_weight):
+        raise NotImplementedError
+
+    def get_state(self):
+        return {
+            f"{key}.{slot}": buffer.copy()
+            for key, buffers in self.buffers.items()
+            for slot, buffer in zip(self.slots, buffers)
+        }
+
+    def set_state(self, state):
+        keys = {name.rsplit('.', 1)[0] for name in state}
+        self.buffers = {
+            key: tuple(np.array(state[f"{key}.{slot}"]) for slot in self.slots)
+            for key in keys
+        }
+
+class Adam(AdaptiveOptimizer):
+    """
+    Adam (Kingma & Ba):
+        m = b1 * m + (1 - b1) * g
+        v = b2 * v + (1 - b2) * g^2
+        w -= lr * m_hat / (sqrt(v_hat) + eps)
+    with bias-corrected m_hat = m / (1 - b1^t), v_hat = v / (1 - b2^t).
+    """
+    slots = ('m', 'v')
+
+    def __init__(self, learning_rate=0.001, beta1=0.9, beta2=0.999, epsilon=1e-8):
+        super().__init__(learning_rate, epsilon)
+        self.beta1 = beta1
+        self.beta2 = beta2
+
+    def get_config(self):
+        return dict(super().get_config(), beta1=self.beta1, beta2=self.beta2)
+
+    def apply(self, param, grad, buffers, scratch, is_weight):
+        m, v = buffers
+        t = self.iterations
+        # b * x + (1 - b) * y == b * (x - y) + y, which needs no temporary
+        m -= grad
+        m *= self.beta1
+        m += grad
+        np.multiply(grad, grad, out=scratch)
+        v -= scratch
+        v *= self.beta2
+        v += scratch
+        # scratch = lr * m_hat / (sqrt(v_hat) + eps)
+        np.sqrt(v, out=scratch)
+        scratch *= 1 / np.sqrt(1 - self.beta2 ** t)
+        scratch += self.epsilon
+        np.divide(m, scratch, out=scratch)
+        scratch *= self.learning_rate / (1 - self.beta1 ** t)
+        param -= scratch
+
+class AdamW(Adam):
+    """Adam with decoupled weight decay (Loshchilov & Hutter) on the weights, not biases."""
+
+    def __init__(self, learning_rate=0.001, beta1=0.9, beta2=0.999, epsilon=1e-8, weight_decay=0.01):
+        super().__init__(learning_rate, beta1, beta2, epsilon)
+        self.weight_decay = weight_decay
+
+    def get_config(self):
+        return dict(super().get_config(), weight_decay=self.weight_decay)
+
+    def apply(self, param, grad, buffers, scratch, is_weight):
+        if is_weight and self.weight_decay:
+            param *= 1 - self.learning_rate * self.weight_decay
+        super().apply(param, grad, buffers, scratch, is_weight)
+
+class RMSProp(AdaptiveOptimizer):
+    """
+    RMSProp:
+        v = rho * v + (1 - rho) * g^2
+        w -= lr * g / (sqrt(v) + eps)
+    """
+    slots = ('v',)
+
+    def __init__(self, learning_rate=0.001, rho=0.9, epsilon=1e-8):
+        super().__init__(learning_rate, epsilon)
+        self.rho = rho
+
+    def get_config(self):
+        return dict(super().get_config(), rho=self.rho)
+
+    def apply(self, param, grad, buffers, scratch, is_weight):
+        v, = buffers
+        np.multiply(grad, grad, out=scratch)
+        v -= scratch
+        v *= self.rho
+        v += scratch
+        np.sqrt(v, out=scratch)
+        scratch += self.epsilon
+        np.divide(grad, scratch, out=scratch)
+        scratch *= self.learning_rate
+        param -= scratch
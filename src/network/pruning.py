@@ -0,0 +1,113 @@
+"""
+Magnitude pruning of a trained NeuralNetwork.
+
+prune() zeroes the smallest weights of every Dense layer, either against
+one global threshold or a threshold per layer, and returns the masks of
+the weights that were kept. fine_tune() trains with those masks held in
+place, and to_sparse() swaps the pruned layers for SparseDense for
+inference.
+
+    masks = prune(nn, 0.9)
+    fine_tune(nn, masks, x_train, y_train, batches=200)
+    sparse_nn = to_sparse(nn)
+"""
+import numpy as np
+
+from .layers import Dense, SparseDense
+from .loss import CrossEntropy
+from .model import NeuralNetwork
+from .optimizer import SGD
+
+def dense_layers(network):
+    return [layer for layer in network.layers if isinstance(layer, Dense)]
+
+def magnitude_masks(network, sparsity, scope="global"):
+    """
+    Boolean keep-masks for the Dense layers' weights (biases are never pruned).
+
+    sparsity is the fraction of weights to remove: one float, or one value
+    per Dense layer (which implies scope="layer"). With scope="global" a
+    single magnitude threshold is used across all layers, so layers with
+    many small weights lose more of them.
+    """
+    layers = dense_layers(network)
+    if np.ndim(sparsity):
+        if len(sparsity) != len(layers):
+            raise ValueError(f"Expected {len(layers)} sparsity values, got {len(sparsity)}")
+        scope = "layer"
+    if scope not in ("global", "layer"):
+        raise ValueError(f"Unknown pruning scope: {scope}")
+    sparsities = np.broadcast_to(np.asarray(sparsity, dtype=float), (len(layers),))
+    if np.any((sparsities < 0) | (sparsities >= 1)):
+        raise ValueError("sparsity must be in [0, 1)")
+
+    if scope == "global":
+        magnitudes = np.concatenate([np.abs(layer.weights).ravel() for layer in layers])
+        thresholds = [_threshold(magnitudes, sparsities[0])] * len(layers)
+    else:
+        thresholds = [_threshold(np.abs(layer.weights).ravel(), s) for layer, s in zip(layers, sparsities)]
+    return [np.abs(layer.weights) > t for layer, t in zip(layers, thresholds)]
+
+def _threshold(magnitudes, sparsity):
+    k = int(sparsity * magnitudes.size)
+    if k == 0:
+        return -np.inf
+    # Magnitude of the k-th smallest weight; everything at or below it goes
+    return np.partition(magnitudes, k - 1)[k - 1]
+
+def apply_masks(network, masks):
+    """Zero the pruned weights and their momentum buffers."""
+    for layer, mask in zip(dense_layers(network), masks):
+        layer.weights *= mask
+        layer.weights_m *= mask
+
+def prune(network, sparsity, scope="global"):
+    """Prune network in place; returns the keep-masks (see magnitude_masks)."""
+    masks = magnitude_masks(network, sparsity, scope)
+    apply_masks(network, masks)
+    network.bump_version()
+    return masks
+
+def fine_tune(network, masks, x, y, batches=100, batch_size=64, learning_rate=0.01, momentum=0.9, loss_fn=None):
+    """
+    Train a pruned network for a number of batches, re-applying the masks
+    after every step so pruned weights stay at zero. Returns the last loss.
+    """
+    loss_fn = loss_fn or CrossEntropy()
+    optimizer = SGD(learning_rate=learning_rate, momentum=momentum)
+    loss = float("nan")
+    for _ in range(batches):
+        idx = np.random.randint(0, x.shape[0], batch_size)
+        loss, _ = network.train_step(x[idx], y[idx], loss_fn, optimizer)
+        apply_masks(network, masks)
+    return float(loss)
+
+def to_sparse(network, min_sparsity=0.9):
+    """
+    A new network for inference where every Dense layer with at least
+    min_sparsity zero weights is replaced by a SparseDense. Below that
+    NumPy's BLAS matmul wins, so those layers are shared with the original.
+    """
+    layers = []
+    for layer in network.layers:
+        if isinstance(layer, Dense) and np.mean(layer.weights == 0) >= min_sparsity:
+            layers.append(SparseDense.from_dense(layer))
+        else:
+            layers.append(layer)
+    return NeuralNetwork(layers)
+
+def sparsity_report(network):
+    """Fraction of zero weights per Dense/SparseDense layer and overall."""
+    layers = []
+    zeros = total = 0
+    for i, layer in enumerate(network.layers):
+        if isinstance(layer, Dense):
+            size, nonzero = layer.weights.size, np.count_nonzero(layer.weights)
+        elif isinstance(layer, SparseDense):
+            size, nonzero = layer.input_size * layer.bias.shape[1], np.count_nonzero(layer.data)
+        else:
+            continue
+        layers.append({"layer": i, "type": type(layer).__name__, "weights": size, "sparsity": 1 - nonzero / size})
+        zeros += size - nonzero
+        total += size
+    return {"layers": layers, "sparsity": zeros / total if total else 0.0}
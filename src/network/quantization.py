@@ -0,0 +1,199 @@
+"""
+Post-training int8 quantization for inference.
+
+Weights are quantized symmetrically per output channel (one scale per
+neuron); activations per tensor, with scales calibrated by running the
+float network on a sample of inputs. Each QuantizedDense multiplies int8
+activations by int8 weights with int32 accumulation, and when followed by a
+ReLU it fuses bias, ReLU and requantization for the next layer into one
+step, so activations stay int8 between layers.
+
+NumPy has no int8 BLAS kernel, so the accumulation runs as a float32 GEMM
+on the integer values: float32 represents every integer up to 2**24
+exactly, which covers K * 127 * 127 for K <= MAX_EXACT_K inputs. Longer
+rows are accumulated in chunks of MAX_EXACT_K.
+
+    quantized = quantize_network(nn, x_test[:1000])
+    probabilities = quantized.infer(x)
+"""
+import time
+
+import numpy as np
+
+from .activations import softmax
+from .layers import Dense, SparseDense, ReLU, Softmax
+
+INT8_MAX = 127
+MAX_EXACT_K = 2 ** 24 // (INT8_MAX * INT8_MAX)
+
+def quantize_weights(weights):
+    """Symmetric per-output-channel int8 weights: weights ~= q * scales."""
+    max_abs = np.abs(weights).max(axis=0)
+    scales = np.where(max_abs > 0, max_abs / INT8_MAX, 1.0).astype(np.float32)
+    q = np.clip(np.rint(weights / scales), -INT8_MAX, INT8_MAX).astype(np.int8)
+    return q, scales
+
+def activation_scale(values, percentile=100.0):
+    """Per-tensor scale mapping |values| up to the given percentile onto 127."""
+    magnitudes = np.abs(values)
+    limit = magnitudes.max() if percentile >= 100 else np.percentile(magnitudes, percentile)
+    return float(limit) / INT8_MAX if limit > 0 else 1.0
+
+def quantize_input(x, scale):
+    return np.clip(np.rint(np.asarray(x, dtype=np.float32) / np.float32(scale)), -INT8_MAX, INT8_MAX)
+
+class QuantizedDense:
+    """
+    int8 Dense layer: y = (q_x @ q_w) * (input_scale * weight_scales) + bias.
+
+    With output_scale set (a ReLU follows), requantize() returns the next
+    layer's int8 input directly: clip(rint(acc * m + b), 0, 127), where the
+    lower clip is the ReLU.
+    """
+    def __init__(self, weights, scales, bias, input_scale, output_scale=None):
+        self.weights = weights
+        self.scales = scales
+        self.bias = np.asarray(bias, dtype=np.float32).reshape(-1)
+        self.input_scale = input_scale
+        self.output_scale = output_scale
+        # GEMM operand holding the same integer values (see module docstring)
+        self._weights_f32 = weights.astype(np.float32)
+        self._dequant = (np.float32(input_scale) * scales).astype(np.float32)
+        if output_scale is not None:
+            self._requant = (self._dequant / np.float32(output_scale)).astype(np.float32)
+            self._requant_bias = (self.bias / np.float32(output_scale)).astype(np.float32)
+
+    @classmethod
+    def from_dense(cls, layer, input_scale, output_scale=None):
+        weights = layer.to_dense() if isinstance(layer, SparseDense) else layer.weights
+        q, scales = quantize_weights(weights)
+        return cls(q, scales, layer.bias, input_scale, output_scale)
+
+    def accumulate(self, q_x):
+        """Exact int32 accumulation of int8 inputs against the int8 weights."""
+        k = q_x.shape[1]
+        if k <= MAX_EXACT_K:
+            return q_x @ self._weights_f32
+        acc = np.zeros((q_x.shape[0], self._weights_f32.shape[1]), dtype=np.int32)
+        for start in range(0, k, MAX_EXACT_K):
+            acc += (q_x[:, start:start + MAX_EXACT_K] @ self._weights_f32[start:start + MAX_EXACT_K]).astype(np.int32)
+        return acc
+
+    def dequantize(self, acc):
+        return acc * self._dequant + self.bias
+
+    def requantize(self, acc):
+        return np.clip(np.rint(acc * self._requant + self._requant_bias), 0, INT8_MAX)
+
+    @property
+    def nbytes(self):
+        return self.weights.nbytes + self.scales.nbytes + self.bias.nbytes
+
+class QuantizedNetwork:
+    """int8 counterpart of a Dense/ReLU MLP with a Softmax (or linear) output."""
+    def __init__(self, layers, input_scale, softmax_output=True):
+        self.layers = layers
+        self.input_scale = input_scale
+        self.softmax_output = softmax_output
+
+    def infer(self, input_data, return_activations=False):
+        """
+        Same contract as NeuralNetwork.infer(). Activations are only
+        dequantized when requested; they are listed per original layer
+        (Dense output, then the activation output).
+        """
+        activations = []
+        q = quantize_input(input_data, self.input_scale)
+        for layer in self.layers:
+            acc = layer.accumulate(q)
+            if layer.output_scale is None:
+                output = layer.dequantize(acc)
+                if return_activations:
+                    activations.append(output)
+                break
+            if return_activations:
+                pre_activation = layer.dequantize(acc)
+                activations.extend([pre_activation, np.maximum(pre_activation, 0)])
+            q = layer.requantize(acc)
+        if self.softmax_output:
+            output = softmax(output)
+            if return_activations:
+                activations.append(output)
+        if return_activations:
+            return output, activations
+        return output
+
+    predict = infer
+
+    @property
+    def nbytes(self):
+        return sum(layer.nbytes for layer in self.layers)
+
+def quantize_network(network, calibration_x, percentile=100.0):
+    """
+    Quantize a Dense + ReLU network (output layer Dense + Softmax, or
+    Dense alone), calibrating activation scales on calibration_x.
+    """
+    layers = network.layers
+    i = 0
+    specs = []
+    while i < len(layers):
+        if not isinstance(layers[i], (Dense, SparseDense)):
+            raise ValueError(f"Cannot quantize {type(layers[i]).__name__} at layer {i}; expected Dense")
+        following = layers[i + 1] if i + 1 < len(layers) else None
+        if isinstance(following, ReLU):
+            specs.append((i, True))
+            i += 2
+        elif following is None or (isinstance(following, Softmax) and i + 2 == len(layers)):
+            specs.append((i, False))
+            break
+        else:
+            raise ValueError(f"Cannot quantize {type(following).__name__} after layer {i}; expected ReLU or a final Softmax")
+    if not specs or specs[-1][1]:
+        raise ValueError("The network must end with a Dense layer (optionally followed by Softmax)")
+
+    _, activations = network.infer(calibration_x, return_activations=True)
+    input_scale = activation_scale(calibration_x, percentile)
+    scale = input_scale
+    quantized = []
+    for index, relu in specs:
+        # The ReLU output scale is also the next layer's input scale
+        output_scale = activation_scale(activations[index + 1], percentile) if relu else None
+        quantized.append(QuantizedDense.from_dense(layers[index], scale, output_scale))
+        scale = output_scale
+    return QuantizedNetwork(quantized, input_scale, softmax_output=isinstance(layers[-1], Softmax))
+
+def float_nbytes(network):
+    """Bytes of the float weights and biases of a network."""
+    return sum(
+        getattr(layer, key).nbytes for layer in network.layers
+        for key in ('weights', 'data', 'bias') if hasattr(layer, key)
+    )
+
+def _time_per_call(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+def compare(network, quantized, x, y, repeat=20, batch_size=64):
+    """
+    Accuracy, size and latency of the int8 path against the float path.
+    y is one-hot; latencies are per call in microseconds.
+    """
+    labels = np.argmax(y, axis=1)
+    float_acc = float(np.mean(np.argmax(network.infer(x), axis=1) == labels))
+    int8_acc = float(np.mean(np.argmax(quantized.infer(x), axis=1) == labels))
+    report = {
+        "float_accuracy": float_acc,
+        "int8_accuracy": int8_acc,
+        "accuracy_delta": int8_acc - float_acc,
+        "float_bytes": float_nbytes(network),
+        "int8_bytes": quantized.nbytes,
+    }
+    report["size_ratio"] = report["float_bytes"] / max(1, report["int8_bytes"])
+    for batch in (1, batch_size):
+        sample = x[:batch]
+        report[f"float_us_batch{batch}"] = 1e6 * _time_per_call(lambda: network.infer(sample), repeat)
+        report[f"int8_us_batch{batch}"] = 1e6 * _time_per_call(lambda: quantized.infer(sample), repeat)
+    return report
@@ -0,0 +1,103 @@
+"""
+Learning-rate schedules and early stopping.
+
+A schedule maps the optimizer's step count to a learning rate; pass it
+to NeuralNetwork.train_step(), which sets optimizer.learning_rate before
+every update. All schedules ramp up linearly over warmup_steps first.
+
+    schedule = CosineDecay(0.001, total_steps=3 * 938, warmup_steps=100)
+    nn.train_step(x, y, loss_fn, optimizer, schedule=schedule)
+"""
+import math
+
+class Schedule:
+    """Constant learning rate (after the warmup)."""
+
+    def __init__(self, learning_rate, warmup_steps=0):
+        self.learning_rate = learning_rate
+        self.warmup_steps = warmup_steps
+
+    def __call__(self, step):
+        if step < self.warmup_steps:
+            return self.learning_rate * (step + 1) / self.warmup_steps
+        return self.decay(step - self.warmup_steps)
+
+    def decay(self, step):
+        return self.learning_rate
+
+    def get_config(self):
+        return {'learning_rate': self.learning_rate, 'warmup_steps': self.warmup_steps}
+
+class StepDecay(Schedule):
+    """Multiply the rate by gamma every step_size steps."""
+
+    def __init__(self, learning_rate, step_size, gamma=0.5, warmup_steps=0):
+        super().__init__(learning_rate, warmup_steps)
+        self.step_size = step_size
+        self.gamma = gamma
+
+    def decay(self, step):
+        return self.learning_rate * self.gamma ** (step // self.step_size)
+
+    def get_config(self):
+        return dict(super().get_config(), step_size=self.step_size, gamma=self.gamma)
+
+class CosineDecay(Schedule):
+    """Half a cosine from learning_rate down to min_lr over total_steps (warmup included)."""
+
+    def __init__(self, learning_rate, total_steps, min_lr=0.0, warmup_steps=0):
+        super().__init__(learning_rate, warmup_steps)
+        self.total_steps = total_steps
+        self.min_lr = min_lr
+
+    def decay(self, step):
+        span = max(1, self.total_steps - self.warmup_steps)
+        progress = min(1.0, step / span)
+        return self.min_lr + 0.5 * (self.learning_rate - self.min_lr) * (1 + math.cos(math.pi * progress))
+
+    def get_config(self):
+        return dict(super().get_config(), total_steps=self.total_steps, min_lr=self.min_lr)
+
+SCHEDULES = ('constant', 'step', 'cosine')
+
+def make_schedule(name, learning_rate, total_steps, warmup_steps=0):
+    """
+    Schedule by name for a run of total_steps; the step schedule halves
+    the rate three times over the run.
+    """
+    if name == 'constant':
+        return Schedule(learning_rate, warmup_steps)
+    if name == 'step':
+        return StepDecay(learning_rate, max(1, -(-(total_steps - warmup_steps) // 4)), 0.5, warmup_steps)
+    if name == 'cosine':
+        return CosineDecay(learning_rate, total_steps, warmup_steps=warmup_steps)
+    raise ValueError(f"Unknown schedule: {name}")
+
+class EarlyStopping:
+    """
+    Decides when to end a run from periodic accuracy measurements.
+
+    Stops once accuracy reaches target (if set), or when it has not
+    improved by more than min_delta for `patience` consecutive
+    measurements (if set). update() returns True when training should stop;
+    `reason` then says why.
+    """
+    def __init__(self, target=None, patience=None, min_delta=0.0):
+        self.target = target
+        self.patience = patience
+        self.min_delta = min_delta
+        self.best = -math.inf
+        self.best_step = None
+        self.stale = 0
+        self.reason = None
+
+    def update(self, step, accuracy):
+        if accuracy > self.best + self.min_delta:
+            self.best, self.best_step, self.stale = accuracy, step, 0
+        else:
+            self.stale += 1
+        if self.target is not None and accuracy >= self.target:
+            self.reason = f"reached target accuracy {self.target:.4f} at step {step}"
+        elif self.patience is not None and self.stale >= self.patience:
+            self.reason = f"no improvement for {self.stale} evaluations (best {self.best:.4f} at step {self.best_step})"
+        return self.reason is not None
@@ -0,0 +1,57 @@
+"""
+Control over the number of threads used by NumPy's BLAS backend.
+
+BLAS libraries read their thread count from the environment when NumPy is
+first imported, so worker processes are pinned through blas_thread_env().
+Inside an already running process, limit_blas_threads() uses threadpoolctl
+when it is installed and is a no-op otherwise.
+"""
+import contextlib
+import os
+
+try:
+    from threadpoolctl import threadpool_limits, threadpool_info
+except ImportError:
+    threadpool_limits = None
+    threadpool_info = None
+
+BLAS_ENV_VARS = (
+    "OMP_NUM_THREADS",
+    "OPENBLAS_NUM_THREADS",
+    "MKL_NUM_THREADS",
+    "VECLIB_MAXIMUM_THREADS",
+    "NUMEXPR_NUM_THREADS",
+)
+
+def blas_thread_env(threads):
+    """Environment variables pinning BLAS to `threads` threads."""
+    return {name: str(threads) for name in BLAS_ENV_VARS}
+
+@contextlib.contextmanager
+def pinned_env(threads):
+    """Temporarily export blas_thread_env(threads), e.g. while spawning workers."""
+    saved = {name: os.environ.get(name) for name in BLAS_ENV_VARS}
+    os.environ.update(blas_thread_env(threads))
+    try:
+        yield
+    finally:
+        for name, value in saved.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+def limit_blas_threads(threads):
+    """Context manager limiting BLAS threads in this process (None = no limit)."""
+    if threads is None or threadpool_limits is None:
+        return contextlib.nullcontext()
+    return threadpool_limits(limits=threads, user_api="blas")
+
+def can_limit_threads():
+    return threadpool_limits is not None
+
+def current_blas_threads():
+    if threadpool_info is None:
+        return None
+    counts = [pool["num_threads"] for pool in threadpool_info() if pool.get("user_api") == "blas"]
+    return max(counts) if counts else None
@@ -3,6 +3,7 @@ import json
 import os
 import threading
 import time
+from contextlib import asynccontextmanager
 from threading import Lock
 
 try:
@@ -12,25 +13,118 @@ try:
 except ImportError:
     pass
 
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, Request, Response, WebSocket, WebSocketDisconnect
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
 import numpy as np
 
-from network import NeuralNetwork, Dense, ReLU, Softmax, CrossEntropy, SGD
+from network import (
+    Dense, ReLU, Sigmoid, Softmax, Reshape, Flatten, Conv2D, MaxPool2D, CrossEntropy, build_network,
+    SGD, Adam, AdamW, RMSProp, EarlyStopping, make_schedule
+)
+from network.schedules import SCHEDULES
 from data.loader import download_mnist, load_mnist, preprocess_data, get_batches
+import sweep
+from autotune import autotune, DEFAULT_BATCH_SIZES
+from network.threads import limit_blas_threads
+from network.checkpoint import CheckpointWriter, load_checkpoint, restore, snapshot
+from network.quantization import quantize_network, quantize_weights, compare as compare_quantized
+from serving import (
+    SnapshotCache, PredictionCache, build_assets, PrecompressedStaticFiles,
+    TelemetryWriter, TelemetryReader, list_runs, EventLoopMonitor
+)
+from serving import memory
+from serving.protocol import (
+    OutboundMessage, encode_frame, PROTOCOL_JSON, PROTOCOLS, PRECISIONS, MAX_MESSAGES_PER_FRAME, MAX_DETAIL
+)
 
 # Environment
 PORT = int(os.getenv("PORT", 8000))
 ENVIRONMENT = os.getenv("ENVIRONMENT", "development")
 ALLOWED_ORIGINS = os.getenv("ALLOWED_ORIGINS", "http://localhost:8000").split(",")
+SNAPSHOT_CACHE_MB = float(os.getenv("SNAPSHOT_CACHE_MB", 32))
+PREDICT_CACHE_ENTRIES = int(os.getenv("PREDICT_CACHE_ENTRIES", 4096))
+PREDICT_CACHE_MB = float(os.getenv("PREDICT_CACHE_MB", 16))
+# Grey levels inputs are quantized to before hashing (near-duplicate matching)
+PREDICT_CACHE_LEVELS = int(os.getenv("PREDICT_CACHE_LEVELS", 16))
+# Engine serving /predict: "float" or "int8" (post-training quantized)
+INFERENCE_ENGINE = os.getenv("INFERENCE_ENGINE", "float")
+# MNIST test images used to calibrate int8 activation scales
+CALIBRATION_SIZE = int(os.getenv("CALIBRATION_SIZE", 1000))
+# Further test images, disjoint from those, for the int8 accuracy report
+INT8_EVAL_SIZE = int(os.getenv("INT8_EVAL_SIZE", 2000))
+# Benchmark batch size / BLAS threads per architecture before training (0 = fixed)
+AUTOTUNE = os.getenv("AUTOTUNE", "1") == "1"
+DEFAULT_BATCH_SIZE = int(os.getenv("BATCH_SIZE", 64))
+SWEEP_RESULTS = os.getenv("SWEEP_RESULTS", "sweep_results.jsonl")
+# Sweep worker processes each load MNIST; one fits a 512 MB instance
+SWEEP_WORKERS = int(os.getenv("SWEEP_WORKERS", 1))
+# Periodic training snapshots for /resume-training (CHECKPOINT_EVERY=0 only
+# checkpoints when training stops or completes)
+CHECKPOINT_DIR = os.getenv("CHECKPOINT_DIR", "checkpoints")
+CHECKPOINT_EVERY = int(os.getenv("CHECKPOINT_EVERY", 200))
+CHECKPOINT_KEEP = int(os.getenv("CHECKPOINT_KEEP", 3))
+# Seconds /stop-training waits for the run to exit (its final checkpoint included)
+STOP_TIMEOUT = float(os.getenv("STOP_TIMEOUT", 60))
+# Optimizer, learning-rate schedule and early stopping for new runs
+OPTIMIZER = os.getenv("OPTIMIZER", "sgd")
+LR_SCHEDULE = os.getenv("LR_SCHEDULE", "constant")
+WARMUP_STEPS = int(os.getenv("WARMUP_STEPS", 0))
+TARGET_ACCURACY = float(os.getenv("TARGET_ACCURACY", 0))  # 0 = train all epochs
+EARLY_STOP_PATIENCE = int(os.getenv("EARLY_STOP_PATIENCE", 0))  # evaluations; 0 = off
+EVAL_EVERY = int(os.getenv("EVAL_EVERY", 100))  # batches between held-out evaluations
+EVAL_SIZE = int(os.getenv("EVAL_SIZE", 1000))
+# Memory budget for the process; 0 = 90% of the container's memory limit, if there is one
+MEMORY_BUDGET_MB = float(os.getenv("MEMORY_BUDGET_MB", 0))
+# How often the event-loop lag monitor samples (see /api/status)
+LOOP_MONITOR_INTERVAL_MS = float(os.getenv("LOOP_MONITOR_INTERVAL_MS", 100))
+# Telemetry logs of training runs, for /replay (TELEMETRY=0 disables them)
+TELEMETRY = os.getenv("TELEMETRY", "1") == "1"
+TELEMETRY_DIR = os.getenv("TELEMETRY_DIR", "runs")
+TELEMETRY_KEEP = int(os.getenv("TELEMETRY_KEEP", 20))
+# Batches between logged updates / weight snapshots / full weight keyframes
+TELEMETRY_EVERY = int(os.getenv("TELEMETRY_EVERY", 5))
+TELEMETRY_WEIGHTS_EVERY = int(os.getenv("TELEMETRY_WEIGHTS_EVERY", 50))
+TELEMETRY_KEYFRAME_EVERY = int(os.getenv("TELEMETRY_KEYFRAME_EVERY", 500))
+STATIC_BUILD_DIR = os.getenv("STATIC_BUILD_DIR", os.path.join(os.path.dirname(__file__), "..", "build", "static"))
 
 # Training lock for multi-user safety
 training_lock = Lock()
 training_in_progress = False
+# The current run's thread and stop flag; each run gets its own flag, so a
+# run that is still winding down can never stop or finish a newer one
+training_thread = None
+training_stop = threading.Event()
+
+# Hyperparameter sweeps run on their own process pool, one at a time
+sweep_lock = Lock()
+sweep_state = {
+    "running": False,
+    "stop": False,
+    "completed": 0,
+    "leaderboard": []
+}
+
+# Replays of recorded runs, one at a time; training takes priority
+replay_lock = Lock()
+replay_stop = threading.Event()
+replay_state = {
+    "running": False,
+    "run": None,
+    "speed": 1.0,
+    "step": 0
+}
+
+loop_monitor = EventLoopMonitor(LOOP_MONITOR_INTERVAL_MS / 1000)
+
+@asynccontextmanager
+async def lifespan(app):
+    loop_monitor.start()
+    yield
+    await loop_monitor.stop()
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -40,53 +134,308 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Outbound messages kept per client before the oldest are dropped
+MAX_PENDING_MESSAGES = int(os.getenv("WS_MAX_PENDING", 32))
+# Update frames per second each client should receive when it can keep up
+WS_TARGET_FPS = float(os.getenv("WS_TARGET_FPS", 10))
+
+class RateController:
+    """
+    Per-client pacing of training updates.
+
+    Updates are sent at most target_fps times per second. The time each send
+    takes to drain into the socket is tracked; a client whose sends eat a
+    large share of its frame budget gets a longer interval and a lower level
+    of detail, and recovers once its sends become cheap again.
+    """
+    SLOW_SHARE = 0.5
+    FAST_SHARE = 0.1
+    # Consecutive slow/fast sends needed before changing detail level
+    HYSTERESIS = 3
+
+    def __init__(self, target_fps):
+        self.interval = 1.0 / target_fps
+        self.next_due = 0.0
+        self.send_time = 0.0
+        self.bytes_per_second = 0.0
+        self.detail = 0
+        self._slow = 0
+        self._fast = 0
+
+    def time_until_due(self):
+        return max(0.0, self.next_due - time.monotonic())
+
+    def claim(self):
+        """An update was handed to the sender; the next one is not due until a full interval later."""
+        self.next_due = time.monotonic() + max(self.interval, 2 * self.send_time)
+
+    def record_send(self, elapsed, nbytes):
+        self.send_time = 0.8 * self.send_time + 0.2 * elapsed
+        if elapsed > 0:
+            self.bytes_per_second = 0.8 * self.bytes_per_second + 0.2 * (nbytes / elapsed)
+        # Never let a client spend more than half its time draining sends
+        self.next_due = time.monotonic() + max(self.interval, 2 * self.send_time)
+
+        if self.send_time > self.SLOW_SHARE * self.interval:
+            self._slow, self._fast = self._slow + 1, 0
+        elif self.send_time < self.FAST_SHARE * self.interval:
+            self._slow, self._fast = 0, self._fast + 1
+        else:
+            self._slow = self._fast = 0
+        if self._slow >= self.HYSTERESIS and self.detail < MAX_DETAIL:
+            self.detail += 1
+            self._slow = 0
+        elif self._fast >= self.HYSTERESIS and self.detail > 0:
+            self.detail -= 1
+            self._fast = 0
+
+    def stats(self):
+        return {
+            "detail": self.detail,
+            "send_ms": round(self.send_time * 1000, 3),
+            "bytes_per_second": round(self.bytes_per_second),
+            "interval_ms": round(max(self.interval, 2 * self.send_time) * 1000, 1)
+        }
+
+class ClientConnection:
+    def __init__(self, websocket: WebSocket):
+        self.websocket = websocket
+        self.protocol = PROTOCOL_JSON
+        self.precision = "f32"
+        self.pending: list[OutboundMessage] = []
+        # Only the newest training update is worth sending to a client;
+        # update_position is where it sits among the pending messages
+        self.latest_update = None
+        self.update_position = 0
+        self.rate = RateController(WS_TARGET_FPS)
+        self.ready = asyncio.Event()
+        # Set when a non-update message is queued, to cut a pacing wait short
+        self.urgent = asyncio.Event()
+        self.sender = None
+        # True while a frame is being written to the socket
+        self.sending = False
+        self.frames_sent = 0
+        self.messages_sent = 0
+        self.bytes_sent = 0
+        self.dropped = 0
+        self.skipped = 0
+
+    def push(self, message: OutboundMessage):
+        if message.type == "update":
+            if self.latest_update is not None:
+                self.skipped += 1
+            self.latest_update = message
+            self.update_position = len(self.pending)
+        else:
+            self.pending.append(message)
+            if len(self.pending) > MAX_PENDING_MESSAGES:
+                del self.pending[0]
+                self.dropped += 1
+                self.update_position = max(0, self.update_position - 1)
+            self.urgent.set()
+        self.ready.set()
+
 class ConnectionManager:
     def __init__(self):
-        self.active_connections: list[WebSocket] = []
+        self.clients: dict[WebSocket, ClientConnection] = {}
         self.loop = None
 
+    @property
+    def active_connections(self):
+        return list(self.clients)
+
     async def connect(self, websocket: WebSocket):
         await websocket.accept()
-        self.active_connections.append(websocket)
+        self.loop = asyncio.get_running_loop()
+        client = ClientConnection(websocket)
+        self.clients[websocket] = client
+        client.sender = asyncio.create_task(self._send_loop(client))
 
     def disconnect(self, websocket: WebSocket):
-        if websocket in self.active_connections:
-            self.active_connections.remove(websocket)
+        client = self.clients.pop(websocket, None)
+        if client and client.sender and client.sender is not asyncio.current_task():
+            client.sender.cancel()
 
-    async def broadcast(self, message: str):
-        disconnected = []
-        for connection in self.active_connections:
-            try:
-                await connection.send_text(message)
-            except Exception as e:
-                disconnected.append(connection)
-        for conn in disconnected:
-            self.disconnect(conn)
+    def configure(self, websocket: WebSocket, protocol, precision):
+        client = self.clients.get(websocket)
+        if client is None:
+            return None
+        client.protocol = protocol if protocol in PROTOCOLS else PROTOCOL_JSON
+        client.precision = precision if precision in PRECISIONS else "f16"
+        return client
+
+    def send(self, websocket: WebSocket, payload: dict):
+        client = self.clients.get(websocket)
+        if client:
+            client.push(OutboundMessage(payload))
+
+    def enqueue(self, payload: dict):
+        # Encoded lazily, once per wire format, however many clients get it
+        message = OutboundMessage(payload)
+        for client in self.clients.values():
+            client.push(message)
+
+    def publish(self, payload: dict):
+        """Thread-safe broadcast, used from the training thread."""
+        if self.loop and not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(self.enqueue, payload)
+
+    def wants_update(self):
+        """True when at least one client is due for a training update."""
+        # A client with a send in flight is not due, however long the send takes
+        return any(not c.sending and c.rate.time_until_due() == 0 for c in list(self.clients.values()))
+
+    async def _send_loop(self, client: ClientConnection):
+        websocket = client.websocket
+        try:
+            while True:
+                await client.ready.wait()
+                client.ready.clear()
+                wait = client.rate.time_until_due()
+                if client.latest_update is not None and not client.pending and wait > 0:
+                    # Nothing urgent: let updates collapse until this client is
+                    # due, or until another message needs to go out
+                    client.urgent.clear()
+                    try:
+                        await asyncio.wait_for(client.urgent.wait(), timeout=wait)
+                    except asyncio.TimeoutError:
+                        pass
+                # Everything queued since the last send goes out as one frame
+                messages, client.pending = client.pending, []
+                client.urgent.clear()
+                # A held update travels with other messages, in the order it
+                # was queued, so state never arrives after e.g. training_complete
+                if client.latest_update is not None and (messages or client.rate.time_until_due() == 0):
+                    messages.insert(min(client.update_position, len(messages)), client.latest_update)
+                    client.latest_update = None
+                    client.rate.claim()
+                client.sending = True
+                try:
+                    for i in range(0, len(messages), MAX_MESSAGES_PER_FRAME):
+                        chunk = messages[i:i + MAX_MESSAGES_PER_FRAME]
+                        frame = encode_frame(chunk, client.protocol, client.precision, client.rate.detail)
+                        started = time.perf_counter()
+                        if isinstance(frame, bytes):
+                            await websocket.send_bytes(frame)
+                        else:
+                            await websocket.send_text(frame)
+                        client.rate.record_send(time.perf_counter() - started, len(frame))
+                        client.frames_sent += 1
+                        client.messages_sent += len(chunk)
+                        client.bytes_sent += len(frame)
+                finally:
+                    client.sending = False
+                if client.latest_update is not None:
+                    client.ready.set()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            self.disconnect(websocket)
+
+    def stats(self):
+        clients = list(self.clients.values())
+        return {
+            "clients": len(clients),
+            "binary_clients": sum(1 for c in clients if c.protocol != PROTOCOL_JSON),
+            "frames_sent": sum(c.frames_sent for c in clients),
+            "messages_sent": sum(c.messages_sent for c in clients),
+            "bytes_sent": sum(c.bytes_sent for c in clients),
+            "dropped": sum(c.dropped for c in clients),
+            "skipped_updates": sum(c.skipped for c in clients),
+            "target_fps": WS_TARGET_FPS,
+            "rates": [c.rate.stats() for c in clients]
+        }
 
 manager = ConnectionManager()
 
 nn_state = {
     "training": False,
     "network": None,
+    "session": 0,
     "epoch": 0,
     "batch": 0,
     "loss": 0,
     "accuracy": 0,
     "learning_rate": 0.01,
+    "optimizer": "sgd",
+    "schedule": "constant",
+    "warmup_steps": WARMUP_STEPS,
+    "target_accuracy": TARGET_ACCURACY,
+    "test_accuracy": None,
     "batch_delay": 0,
-    "architecture": [784, 128, 64, 10]
+    "architecture": [784, 128, 64, 10],
+    "autotune": None,
+    "engine": INFERENCE_ENGINE if INFERENCE_ENGINE in ("float", "int8") else "float"
+}
+
+ENGINES = ("float", "int8")
+# name -> (class, default learning rate, other constructor arguments)
+OPTIMIZERS = {
+    "sgd": (SGD, 0.01, {"momentum": 0.9}),
+    "adam": (Adam, 0.001, {}),
+    "adamw": (AdamW, 0.001, {"weight_decay": 0.01}),
+    "rmsprop": (RMSProp, 0.001, {})
 }
+OPTIMIZER_NAMES = {cls: name for name, (cls, _, _) in OPTIMIZERS.items()}
+if OPTIMIZER in OPTIMIZERS:
+    nn_state["optimizer"] = OPTIMIZER
+    nn_state["learning_rate"] = OPTIMIZERS[OPTIMIZER][1]
+if LR_SCHEDULE in SCHEDULES:
+    nn_state["schedule"] = LR_SCHEDULE
+# The int8 model served by the "int8" engine, rebuilt when the weights change
+quantize_lock = Lock()
+quantized_model = {"key": None, "model": None, "report": None}
+calibration_data = {}
+# Dataset and optimizer of the run in progress, for memory accounting
+active_run = {}
+
+def default_memory_budget():
+    if MEMORY_BUDGET_MB > 0:
+        return int(MEMORY_BUDGET_MB * 2 ** 20)
+    limit = memory.container_limit()
+    return int(0.9 * limit) if limit else None
+
+memory_budget = memory.MemoryBudget(default_memory_budget())
+
+# Serialized weight snapshots, keyed by (session, version, format)
+snapshot_cache = SnapshotCache(max_bytes=int(SNAPSHOT_CACHE_MB * 1024 * 1024))
+# Encoded /predict responses, keyed by (session, version, input hash, variant)
+prediction_cache = PredictionCache(
+    max_bytes=int(PREDICT_CACHE_MB * 1024 * 1024),
+    max_entries=PREDICT_CACHE_ENTRIES,
+    levels=PREDICT_CACHE_LEVELS
+)
+
+checkpoint_writer = CheckpointWriter(CHECKPOINT_DIR, keep=CHECKPOINT_KEEP)
+
+def set_network(network):
+    # Every new network instance starts a new snapshot session
+    nn_state["session"] += 1
+    nn_state["network"] = network
 
 def get_layer_activations(layer):
+    # Kept as float32 arrays; the protocol layer decides how to encode them
     if hasattr(layer, 'output') and layer.output is not None:
-        avg_act = np.mean(layer.output, axis=0)
-        return avg_act[:100].tolist()
-    return []
+        # Conv feature maps are flattened (row-major NHWC) like Flatten does
+        avg_act = np.mean(layer.output, axis=0).ravel()
+        return avg_act[:100].astype(np.float32)
+    return np.zeros(0, dtype=np.float32)
 
-def serialize_network(network):
+def serialize_network(network, int8=False):
     layers_data = []
     for layer in network.layers:
-        if isinstance(layer, Dense):
+        if isinstance(layer, Dense) and int8:
+            # Small integers instead of float64 text; weights[i][j] ~= q[i][j] * scales[j]
+            q, scales = quantize_weights(layer.weights)
+            layers_data.append({
+                'type': 'QuantizedDense',
+                'weights': q.tolist(),
+                'scales': scales.tolist(),
+                'bias': layer.bias.tolist(),
+                'inputSize': layer.weights.shape[0],
+                'outputSize': layer.weights.shape[1]
+            })
+        elif isinstance(layer, Dense):
             layers_data.append({
                 'type': 'Dense',
                 'weights': layer.weights.tolist(),
@@ -98,105 +447,240 @@ def serialize_network(network):
             layers_data.append({'type': 'ReLU'})
         elif isinstance(layer, Softmax):
             layers_data.append({'type': 'Softmax'})
+        elif isinstance(layer, Conv2D):
+            layers_data.append(dict(
+                layer.get_config(), type='Conv2D', weights=layer.weights.tolist(), bias=layer.bias.tolist()
+            ))
+        elif isinstance(layer, (MaxPool2D, Reshape)):
+            layers_data.append(dict(layer.get_config(), type=type(layer).__name__))
+        elif isinstance(layer, Flatten):
+            layers_data.append({'type': 'Flatten'})
     return layers_data
 
-def training_loop():
+def get_calibration_data(held_out=False):
+    """
+    The MNIST test images int8 scales are calibrated on, or with held_out
+    the INT8_EVAL_SIZE images after them, which the accuracy report uses.
+    """
+    if "x" not in calibration_data:
+        download_mnist()
+        _, (x_test, y_test) = load_mnist()
+        x_test, y_test = preprocess_data(x_test, y_test)
+        end = CALIBRATION_SIZE + INT8_EVAL_SIZE
+        calibration_data["x"], calibration_data["y"] = x_test[:CALIBRATION_SIZE], y_test[:CALIBRATION_SIZE]
+        calibration_data["x_eval"], calibration_data["y_eval"] = x_test[CALIBRATION_SIZE:end], y_test[CALIBRATION_SIZE:end]
+    if held_out:
+        return calibration_data["x_eval"], calibration_data["y_eval"]
+    return calibration_data["x"], calibration_data["y"]
+
+def get_quantized_network(network, session):
+    """int8 copy of network for its current version, calibrated on MNIST test images."""
+    key = (session, network.version)
+    with quantize_lock:
+        if quantized_model["key"] != key:
+            x, _ = get_calibration_data()
+            quantized_model["model"] = quantize_network(network, x)
+            quantized_model["key"] = key
+        return quantized_model["model"]
+
+def get_training_tuning(architecture):
+    if AUTOTUNE:
+        try:
+            nn_state["autotune"] = autotune(architecture)
+            print(f"Autotune: batch_size={nn_state['autotune']['batch_size']}, threads={nn_state['autotune']['threads']}")
+            return nn_state["autotune"]
+        except Exception as e:
+            print(f"Autotune failed ({e}); using batch size {DEFAULT_BATCH_SIZE}")
+    nn_state["autotune"] = None
+    return {"batch_size": DEFAULT_BATCH_SIZE, "threads": None}
+
+def training_loop(resume=None, stop=None):
+    """
+    resume: a loaded checkpoint to continue from instead of a fresh network.
+    stop: this run's stop flag (see /stop-training).
+    """
+    stop = stop or threading.Event()
     global training_in_progress
+    telemetry = None
     try:
         print("Starting training...")
         download_mnist()
         (x_train, y_train), (x_test, y_test) = load_mnist()
         x_train, y_train = preprocess_data(x_train, y_train)
+        x_eval, y_eval = preprocess_data(x_test[:EVAL_SIZE], y_test[:EVAL_SIZE])
+        active_run["data"] = [x_train, y_train, x_test, y_test, x_eval, y_eval]
         
-        arch = nn_state["architecture"]
-        nn_layers = []
-        for i in range(len(arch) - 1):
-            nn_layers.append(Dense(arch[i], arch[i+1], init_type='he' if i < len(arch)-2 else 'xavier'))
-            if i < len(arch) - 2:
-                nn_layers.append(ReLU())
-            else:
-                nn_layers.append(Softmax())
-        nn = NeuralNetwork(nn_layers)
-        
-        nn_state["network"] = nn
         loss_fn = CrossEntropy()
-        optimizer = SGD(learning_rate=0.01, momentum=0.9)
-        
         epochs = 3
-        batch_size = 64
-
         key_moments = {
             'first_forward': False,
             'first_backward': False,
             'loss_spike': False,
             'convergence': False
         }
+        start_epoch, start_batch, resume_rng = 0, 0, None
+
+        if resume is not None:
+            nn, optimizer, resume_rng = restore(resume)
+            meta, extra = resume["meta"], resume["meta"]["extra"]
+            start_epoch, start_batch = meta["epoch"], meta["batch"]
+            epochs = extra.get("epochs", epochs)
+            key_moments.update(extra.get("key_moments", {}))
+            nn_state["architecture"] = extra.get("architecture", nn_state["architecture"])
+            nn_state["optimizer"] = OPTIMIZER_NAMES.get(type(optimizer), nn_state["optimizer"])
+            nn_state["learning_rate"] = extra.get("learning_rate", optimizer.learning_rate)
+            nn_state["schedule"] = extra.get("schedule", nn_state["schedule"])
+            nn_state["warmup_steps"] = extra.get("warmup_steps", nn_state["warmup_steps"])
+            print(f"Resuming from epoch {start_epoch + 1}, batch {start_batch}")
+        else:
+            nn = build_network(nn_state["architecture"])
+            cls, _, kwargs = OPTIMIZERS[nn_state["optimizer"]]
+            optimizer = cls(learning_rate=nn_state["learning_rate"], **kwargs)
         
-        for epoch in range(epochs):
-            if not nn_state["training"]: break
+        set_network(nn)
+        active_run["optimizer"] = optimizer
+        # /set-architecture and /set-optimizer may change nn_state mid-run (for
+        # the next run); checkpoints and logs must describe this run
+        architecture = nn_state["architecture"]
+        # Which activations are activation-function outputs, for reduced detail
+        activation_layers = [i for i, layer in enumerate(nn.layers) if isinstance(layer, (ReLU, Sigmoid, Softmax))]
+        tuning = get_training_tuning(architecture)
+        batch_size = tuning["batch_size"]
+        if resume is not None:
+            # The batch positions only line up with the original batch size
+            batch_size = resume["meta"]["extra"].get("batch_size", batch_size)
+        batches_per_epoch = -(-len(x_train) // batch_size)
+
+        # The schedule runs on optimizer.iterations, so it also survives a resume
+        schedule_name, warmup_steps = nn_state["schedule"], nn_state["warmup_steps"]
+        schedule = make_schedule(schedule_name, nn_state["learning_rate"], epochs * batches_per_epoch, warmup_steps)
+        target = nn_state["target_accuracy"]
+        stopper = None
+        if target or EARLY_STOP_PATIENCE:
+            stopper = EarlyStopping(target=target or None, patience=EARLY_STOP_PATIENCE or None)
+        stop_reason = None
+        nn_state["test_accuracy"] = None
+        started = time.perf_counter()
+
+        def save_checkpoint(epoch, batches, rng_state):
+            # Copies the arrays here; the disk write happens on the writer thread
+            extra = {
+                "architecture": architecture,
+                "batch_size": batch_size,
+                "epochs": epochs,
+                "key_moments": key_moments,
+                "learning_rate": nn_state["learning_rate"],
+                "schedule": schedule_name,
+                "warmup_steps": warmup_steps
+            }
+            checkpoint_writer.submit(snapshot(nn, optimizer, epoch, batches, rng_state, extra))
+
+        position = (start_epoch, start_batch, resume_rng)
+        steps = 0
+
+        if TELEMETRY:
+            try:
+                telemetry = TelemetryWriter.create(TELEMETRY_DIR, {
+                    "architecture": architecture,
+                    "batch_size": batch_size,
+                    "epochs": epochs,
+                    "batches_per_epoch": batches_per_epoch,
+                    "optimizer": nn_state["optimizer"],
+                    "schedule": schedule_name,
+                    "start": [start_epoch, start_batch],
+                    "started": time.strftime("%Y-%m-%dT%H:%M:%S")
+                }, keep=TELEMETRY_KEEP)
+                telemetry.log_weights(0, nn, keyframe=True)
+            except OSError as e:
+                print(f"Telemetry disabled: {e}")
+                telemetry = None
+
+        def emit(payload):
+            # Broadcast to clients and record in the run's telemetry log
+            if manager.loop:
+                manager.publish(payload)
+            if telemetry:
+                telemetry.log_message(steps, payload)
+        
+        # BLAS thread limits are process-wide; restored when training ends
+        with limit_blas_threads(tuning["threads"]):
+            for epoch in range(start_epoch, epochs):
+                if stop.is_set() or stop_reason: break
             
-            nn_state["epoch"] = epoch + 1
-            batches = 0
+                nn_state["epoch"] = epoch + 1
+                batches = 0
+                # The RNG state before the shuffle identifies the epoch's batch order
+                if epoch == start_epoch and resume_rng is not None:
+                    np.random.set_state(resume_rng)
+                    batches = start_batch
+                epoch_rng = np.random.get_state()
+                position = (epoch, batches, epoch_rng)
             
-            for x_batch, y_batch in get_batches(x_train, y_train, batch_size):
-                if not nn_state["training"]: break
+                for x_batch, y_batch in get_batches(x_train, y_train, batch_size, start_batch=batches):
+                    if stop.is_set(): break
 
-                optimizer.learning_rate = nn_state["learning_rate"] 
+                    # /set-learning-rate changes the base rate of the schedule
+                    schedule.learning_rate = nn_state["learning_rate"]
                 
-                loss, y_pred = nn.train_step(x_batch, y_batch, loss_fn, optimizer)
-                predictions = np.argmax(y_pred, axis=1)
-                labels = np.argmax(y_batch, axis=1)
-                acc = np.mean(predictions == labels)
+                    loss, y_pred = nn.train_step(x_batch, y_batch, loss_fn, optimizer, schedule=schedule)
+                    predictions = np.argmax(y_pred, axis=1)
+                    labels = np.argmax(y_batch, axis=1)
+                    acc = np.mean(predictions == labels)
                 
-                batches += 1
-                nn_state["batch"] = batches
-                nn_state["loss"] = float(loss)
-                nn_state["accuracy"] = float(acc)
+                    batches += 1
+                    steps += 1
+                    position = (epoch, batches, epoch_rng)
+                    nn_state["batch"] = batches
+                    nn_state["loss"] = float(loss)
+                    nn_state["accuracy"] = float(acc)
                 
-                activations = [get_layer_activations(layer) for layer in nn.layers]
+                    # Clients are paced individually (RateController); only build an
+                    # update when someone is due for one. Always send the first batch.
+                    send_update = steps == 1 or manager.wants_update()
+                    log_update = telemetry is not None and steps % TELEMETRY_EVERY == 0
+                    activations = [get_layer_activations(layer) for layer in nn.layers] if send_update or log_update else None
                 
-                # Only broadcast every 10 batches (reduces WebSocket spam on free tier); always send first batch
-                if batches == 1 or batches % 10 == 0:
-                    payload = {
-                        "type": "update",
-                        "stats": {
-                            "epoch": epoch + 1,
-                            "batch": batches,
-                            "loss": float(loss),
-                            "accuracy": float(acc)
-                        },
-                        "activations": activations
-                    }
-                    if manager.loop:
-                        asyncio.run_coroutine_threadsafe(
-                            manager.broadcast(json.dumps(payload)),
-                            manager.loop
-                        )
-
-                # Batch delay for speed control
-                if nn_state["batch_delay"] > 0:
-                    time.sleep(nn_state["batch_delay"] / 1000)
-
-                # Check for key teaching moments
-                if batches == 1 and not key_moments['first_forward']:
-                    # Pause after first forward pass
-                    if manager.loop:
+                    if send_update or log_update:
+                        payload = {
+                            "type": "update",
+                            # Server wall clock, for end-to-end latency (see loadtest.py)
+                            "time": time.time(),
+                            "stats": {
+                                "epoch": epoch + 1,
+                                "batch": batches,
+                                "step": steps,
+                                "loss": float(loss),
+                                "accuracy": float(acc),
+                                "learning_rate": float(optimizer.learning_rate)
+                            },
+                            "activations": activations,
+                            "activation_layers": activation_layers
+                        }
+                        if send_update and manager.loop:
+                            manager.publish(payload)
+                        if telemetry:
+                            telemetry.log_message(steps, payload)
+
+                    # Batch delay for speed control
+                    if nn_state["batch_delay"] > 0:
+                        time.sleep(nn_state["batch_delay"] / 1000)
+
+                    # Check for key teaching moments
+                    if batches == 1 and not key_moments['first_forward']:
+                        # Pause after first forward pass
                         pause_payload = {
                             "type": "pause_moment",
                             "reason": "first_forward",
                             "message": "First forward pass complete! Watch how data flows through layers.",
-                            "activations": activations
+                            "activations": activations,
+                            "activation_layers": activation_layers
                         }
-                        asyncio.run_coroutine_threadsafe(
-                            manager.broadcast(json.dumps(pause_payload)),
-                            manager.loop
-                        )
-                    key_moments['first_forward'] = True
-                    time.sleep(3)  # Pause for 3 seconds
+                        emit(pause_payload)
+                        key_moments['first_forward'] = True
+                        time.sleep(3)  # Pause for 3 seconds
                 
-                if batches == 2 and not key_moments['first_backward']:
-                    # Pause after first backward pass
-                    if manager.loop:
+                    if batches == 2 and not key_moments['first_backward']:
+                        # Pause after first backward pass
                         pause_payload = {
                             "type": "pause_moment",
                             "reason": "first_backward",
@@ -204,20 +688,17 @@ def training_loop():
                             "stats": {
                                 "epoch": epoch + 1,
                                 "batch": batches,
+                                "step": steps,
                                 "loss": float(loss),
                                 "accuracy": float(acc)
                             }
                         }
-                        asyncio.run_coroutine_threadsafe(
-                            manager.broadcast(json.dumps(pause_payload)),
-                            manager.loop
-                        )
-                    key_moments['first_backward'] = True
-                    time.sleep(3)
+                        emit(pause_payload)
+                        key_moments['first_backward'] = True
+                        time.sleep(3)
                 
-                # Check for loss spike (something interesting)
-                if batches > 10 and loss > 1.5 and not key_moments['loss_spike']:
-                    if manager.loop:
+                    # Check for loss spike (something interesting)
+                    if batches > 10 and loss > 1.5 and not key_moments['loss_spike']:
                         pause_payload = {
                             "type": "pause_moment",
                             "reason": "high_loss",
@@ -225,22 +706,40 @@ def training_loop():
                             "stats": {
                                 "epoch": epoch + 1,
                                 "batch": batches,
+                                "step": steps,
                                 "loss": float(loss),
                                 "accuracy": float(acc)
                             }
                         }
-                        asyncio.run_coroutine_threadsafe(
-                            manager.broadcast(json.dumps(pause_payload)),
-                            manager.loop
-                        )
-                    key_moments['loss_spike'] = True
-                    time.sleep(2)
+                        emit(pause_payload)
+                        key_moments['loss_spike'] = True
+                        time.sleep(2)
                 
-                if batches % 100 == 0:
-                    print(f"Epoch {epoch+1}, Batch {batches}, Loss: {loss:.4f}, Acc: {acc:.4f}")
+                    if batches % 100 == 0:
+                        print(f"Epoch {epoch+1}, Batch {batches}, Loss: {loss:.4f}, Acc: {acc:.4f}")
+
+                    if CHECKPOINT_EVERY and steps % CHECKPOINT_EVERY == 0:
+                        save_checkpoint(*position)
+                    if telemetry and steps % TELEMETRY_WEIGHTS_EVERY == 0:
+                        telemetry.log_weights(steps, nn, keyframe=steps % TELEMETRY_KEYFRAME_EVERY == 0)
+
+                    if stopper and steps % EVAL_EVERY == 0:
+                        test_acc = float(np.mean(np.argmax(nn.infer(x_eval), axis=1) == np.argmax(y_eval, axis=1)))
+                        nn_state["test_accuracy"] = test_acc
+                        if stopper.update(optimizer.iterations, test_acc):
+                            stop_reason = stopper.reason
+                            print(f"Stopping early: {stop_reason} ({time.perf_counter() - started:.1f}s)")
+                            break
         
+        # Final snapshot, so a stopped run can be resumed and a finished one reloaded
+        if not stop.is_set():
+            save_checkpoint(epochs, 0, np.random.get_state())
+        elif position[2] is not None:
+            save_checkpoint(*position)
+        checkpoint_writer.flush(timeout=30)
+
         # Training complete - send weights
-        if nn_state["training"]:
+        if not stop.is_set():
             print("Training complete! Sending weights...")
             weights_data = serialize_network(nn)
             
@@ -250,17 +749,25 @@ def training_loop():
                 "final_stats": {
                     "epochs": epochs,
                     "final_loss": float(nn_state["loss"]),
-                    "final_accuracy": float(nn_state["accuracy"])
+                    "final_accuracy": float(nn_state["accuracy"]),
+                    "test_accuracy": nn_state["test_accuracy"],
+                    "stopped_early": stop_reason,
+                    "seconds": time.perf_counter() - started
                 },
                 "weights": weights_data
             }
             
             if manager.loop:
-                asyncio.run_coroutine_threadsafe(
-                    manager.broadcast(json.dumps(completion)),
-                    manager.loop
-                )
+                manager.publish(completion)
+            if telemetry:
+                # Replays rebuild the weights from this keyframe
+                telemetry.log_weights(steps, nn, keyframe=True)
+                telemetry.log_message(steps, {k: v for k, v in completion.items() if k != "weights"})
         
+        if telemetry:
+            telemetry.close()
+        active_run.clear()
+
         # Release lock when training completes
         training_in_progress = False
         if training_lock.locked():
@@ -271,6 +778,9 @@ def training_loop():
         print(f"Training error: {e}")
         import traceback
         traceback.print_exc()
+        if telemetry:
+            telemetry.close()
+        active_run.clear()
         training_in_progress = False
         if training_lock.locked():
             training_lock.release()
@@ -285,21 +795,151 @@ async def api_status():
     return {
         "status": "healthy",
         "training_in_progress": training_in_progress,
-        "environment": ENVIRONMENT
+        "environment": ENVIRONMENT,
+        "autotune": nn_state["autotune"],
+        "snapshot_cache": snapshot_cache.stats(),
+        "prediction_cache": prediction_cache.stats(),
+        "websocket": manager.stats(),
+        "checkpoints": checkpoint_writer.stats(),
+        "replay": replay_state,
+        "optimizer": optimizer_settings(),
+        "memory": {"rss": memory.rss_bytes(), **memory_budget.stats()},
+        "event_loop": loop_monitor.stats(),
+        "cpu_seconds": time.process_time()
+    }
+
+def memory_report(top=10):
+    """Bytes per subsystem, process RSS and the budget; tracemalloc's top sites when tracing."""
+    clients = list(manager.clients.values())
+    queued = [m for c in clients for m in c.pending] + [c.latest_update for c in clients if c.latest_update is not None]
+    model = quantized_model["model"]
+    subsystems = {
+        "dataset": memory.deep_nbytes([active_run.get("data"), calibration_data]),
+        **memory.network_bytes(nn_state["network"], active_run.get("optimizer")),
+        "outbound_queues": memory.queue_bytes(queued),
+        "snapshot_cache": snapshot_cache.current_bytes,
+        "prediction_cache": prediction_cache.current_bytes,
+        "quantized_model": model.nbytes if model is not None else 0,
+        "checkpoint_pending": checkpoint_writer.pending_bytes()
+    }
+    return {
+        "session": nn_state["session"],
+        "rss": memory.rss_bytes(),
+        "peak_rss": memory.peak_rss_bytes(),
+        "container_limit": memory.container_limit(),
+        **memory_budget.stats(),
+        "subsystems": subsystems,
+        "accounted": sum(subsystems.values()),
+        "tracing": memory.tracing_report(top)
+    }
+
+def check_memory(architecture, optimizer_name):
+    """
+    None if a training run of architecture fits in the memory budget, else
+    an error response. Raises ValueError/TypeError/KeyError for invalid
+    architectures.
+    """
+    # Autotuning tries the largest candidate batch
+    batch_size = max(DEFAULT_BATCH_SIZES) if AUTOTUNE else DEFAULT_BATCH_SIZE
+    estimate = memory.estimate_training_bytes(architecture, batch_size, optimizer_name)
+    # The run replaces the current network. A run in progress (only possible
+    # for /set-architecture, which applies to the next run) frees its dataset,
+    # network and optimizer state before the next one loads its own
+    releasable = memory.deep_nbytes(active_run.get("data")) + sum(
+        memory.network_bytes(nn_state["network"], active_run.get("optimizer")).values()
+    )
+    return budget_error(estimate, releasable, "training footprint")
+
+def budget_error(estimate, releasable, what):
+    """None if estimate["total"] fits in the memory budget, else an error response."""
+    ok, available = memory_budget.check(estimate["total"], releasable)
+    if ok:
+        return None
+    return {
+        "status": "error",
+        "message": f"Estimated {what} of {estimate['total'] / 2 ** 20:.0f} MB exceeds "
+                   f"the {max(0, available) / 2 ** 20:.0f} MB left in the memory budget",
+        "memory": {"estimate": estimate, "available": available}
     }
 
+@app.get("/api/memory")
+async def api_memory(top: int = 10):
+    return await asyncio.to_thread(memory_report, max(0, top))
+
+@app.post("/api/memory/tracing")
+async def memory_tracing(body: dict):
+    """Body: {"enabled": true | false, "frames": 1}. tracemalloc slows allocations while on."""
+    if body.get("enabled"):
+        memory.start_tracing(max(1, int(body.get("frames", 1))))
+    else:
+        memory.stop_tracing()
+    return {"status": "ok", "tracing": memory.tracing_report(0) is not None}
+
 @app.post("/start-training")
 async def start_training():
-    global training_in_progress, training_thread
+    return start_training_thread()
+
+@app.post("/resume-training")
+async def resume_training(body: dict = None):
+    """Continue from the newest checkpoint, or {"checkpoint": "<name>"}."""
+    name = (body or {}).get("checkpoint")
+    if name:
+        if os.path.basename(name) != name or name not in checkpoint_writer.list_checkpoints():
+            return {"status": "error", "message": f"Unknown checkpoint: {name}"}
+        path = os.path.join(CHECKPOINT_DIR, name)
+    else:
+        # The last run's final checkpoint may still be on its way to disk
+        await asyncio.to_thread(checkpoint_writer.flush, STOP_TIMEOUT)
+        path = checkpoint_writer.latest()
+        if path is None:
+            return {"status": "error", "message": "No checkpoint available"}
+    try:
+        resume = await asyncio.to_thread(load_checkpoint, path)
+    except (OSError, ValueError, KeyError) as e:
+        return {"status": "error", "message": f"Could not load {os.path.basename(path)}: {e}"}
+
+    result = start_training_thread(resume)
+    if result["status"] == "started":
+        result.update(
+            checkpoint=os.path.basename(path),
+            epoch=resume["meta"]["epoch"] + 1,
+            batch=resume["meta"]["batch"]
+        )
+    return result
 
+@app.get("/checkpoints")
+async def list_checkpoints():
+    return {"checkpoints": checkpoint_writer.list_checkpoints()[::-1], **checkpoint_writer.stats()}
+
+def start_training_thread(resume=None):
+    global training_in_progress, training_thread, training_stop
+
+    if sweep_state["running"]:
+        return {"status": "busy", "message": "A hyperparameter sweep is running. Please wait."}
+    if nn_state["training"]:
+        return {"status": "busy", "message": "Training already in progress. Please wait."}
+    if training_thread is not None and training_thread.is_alive():
+        return {"status": "busy", "message": "The previous run is still stopping. Please wait."}
+    if resume is not None:
+        architecture = resume["meta"]["extra"].get("architecture", nn_state["architecture"])
+        # Checkpoints store the class name, e.g. "AdamW"
+        optimizer_name = resume["meta"]["optimizer"]["type"].lower()
+    else:
+        architecture, optimizer_name = nn_state["architecture"], nn_state["optimizer"]
+    over_budget = check_memory(architecture, optimizer_name)
+    if over_budget:
+        return over_budget
     if not training_lock.acquire(blocking=False):
         return {"status": "busy", "message": "Training already in progress. Please wait."}
+    # New training preempts a replay
+    replay_stop.set()
 
     try:
         training_in_progress = True
         nn_state["training"] = True
         manager.loop = asyncio.get_event_loop()
-        training_thread = threading.Thread(target=training_loop, daemon=True)
+        training_stop = threading.Event()
+        training_thread = threading.Thread(target=training_loop, args=(resume, training_stop), daemon=True)
         training_thread.start()
         return {"status": "started"}
     except Exception as e:
@@ -310,13 +950,200 @@ async def start_training():
 
 @app.post("/stop-training")
 async def stop_training():
-    global training_in_progress
+    """Returns once the run has exited and its final checkpoint is on disk."""
+    thread = training_thread
+    training_stop.set()
     nn_state["training"] = False
-    training_in_progress = False
-    if training_lock.locked():
-        training_lock.release()
+    if thread is not None and thread.is_alive():
+        # The run releases the training lock itself on the way out
+        await asyncio.to_thread(thread.join, STOP_TIMEOUT)
+        if thread.is_alive():
+            return {"status": "stopping"}
     return {"status": "stopped"}
 
+def sweep_loop(configs, options):
+    def on_result(result, rung, board):
+        sweep_state["completed"] += 1
+        sweep_state["leaderboard"] = board
+        manager.publish({
+            "type": "sweep_update",
+            "rung": rung,
+            "trial": result["trial"],
+            "val_accuracy": result["val_accuracy"],
+            "leaderboard": board
+        })
+
+    try:
+        board = sweep.successive_halving(
+            configs, results_path=SWEEP_RESULTS, on_result=on_result,
+            should_stop=lambda: sweep_state["stop"], **options
+        )
+        manager.publish({"type": "sweep_complete", "leaderboard": board})
+    except Exception as e:
+        print(f"Sweep error: {e}")
+        manager.publish({"type": "sweep_complete", "error": str(e), "leaderboard": sweep_state["leaderboard"]})
+    finally:
+        sweep_state["running"] = False
+        sweep_lock.release()
+
+@app.post("/start-sweep")
+async def start_sweep(body: dict):
+    space = dict(sweep.DEFAULT_SPACE)
+    space.update({k: v for k, v in body.get("space", {}).items() if k in space})
+    try:
+        if body.get("search", "random") == "grid":
+            configs = sweep.grid_search(space)
+        else:
+            configs = sweep.random_search(space, int(body.get("trials", 8)), body.get("seed"))
+        for config in configs:
+            sweep.validate_config(config)
+        threads = max(1, int(body.get("threads", 1)))
+        options = {
+            "min_batches": int(body.get("min_batches", 100)),
+            "eta": max(2, int(body.get("eta", 3))),
+            "rungs": max(1, int(body.get("rungs", 3))),
+            "workers": sweep.check_workers(body.get("workers", SWEEP_WORKERS), threads, len(configs)),
+            "threads": threads
+        }
+        # Worker processes live outside this process's RSS, but in the same container
+        estimate = memory.estimate_sweep_bytes(configs, options["workers"])
+    except (TypeError, ValueError, KeyError) as e:
+        return {"status": "error", "message": str(e)}
+
+    if training_in_progress:
+        return {"status": "busy", "message": "Training in progress. Please wait."}
+    over_budget = budget_error(estimate, 0, "sweep footprint")
+    if over_budget:
+        return over_budget
+    if not sweep_lock.acquire(blocking=False):
+        return {"status": "busy", "message": "A sweep is already running."}
+    sweep_state.update(running=True, stop=False, completed=0, leaderboard=[])
+    manager.loop = asyncio.get_event_loop()
+    threading.Thread(target=sweep_loop, args=(configs, options), daemon=True).start()
+    return {"status": "started", "trials": len(configs)}
+
+@app.post("/stop-sweep")
+async def stop_sweep():
+    sweep_state["stop"] = True
+    return {"status": "stopping" if sweep_state["running"] else "idle"}
+
+@app.get("/sweep-status")
+async def sweep_status():
+    return {k: v for k, v in sweep_state.items() if k != "stop"}
+
+def network_from_weights(architecture, arrays):
+    """Network with weights/biases from a telemetry log (see weights_at())."""
+    network = build_network(architecture)
+    weighted = [layer for layer in network.layers if getattr(layer, 'weights', None) is not None]
+    for layer, weights, bias in zip(weighted, arrays[0::2], arrays[1::2]):
+        layer.weights = weights.astype(np.float64).reshape(layer.weights.shape)
+        layer.bias = bias.astype(np.float64).reshape(layer.bias.shape)
+    return network
+
+def replay_loop(reader, start, speed):
+    try:
+        started = time.perf_counter()
+        first_ts = None
+        for step, ts, payload in reader.messages(start):
+            if first_ts is None:
+                first_ts = ts
+            # Keep the recorded timing, scaled by speed (0 = as fast as possible)
+            delay = (ts - first_ts) / speed - (time.perf_counter() - started) if speed > 0 else 0
+            if replay_stop.wait(max(0, delay)):
+                break
+            if payload["type"] == "training_complete":
+                arrays = reader.weights_at(step)
+                if arrays is not None:
+                    payload["weights"] = serialize_network(network_from_weights(reader.meta["architecture"], arrays))
+            replay_state["step"] = step
+            if "time" in payload:
+                payload["time"] = time.time()
+            manager.publish(dict(payload, replay=reader.run_id))
+        manager.publish({"type": "replay_complete", "run": reader.run_id, "stopped": replay_stop.is_set()})
+    except Exception as e:
+        print(f"Replay error: {e}")
+        manager.publish({"type": "replay_complete", "run": reader.run_id, "error": str(e)})
+    finally:
+        reader.close()
+        replay_state["running"] = False
+        replay_lock.release()
+
+def open_run(run_id):
+    """TelemetryReader for run_id (newest run if None), or None if unknown."""
+    runs = list_runs(TELEMETRY_DIR)
+    if run_id is None and runs:
+        run_id = runs[-1]
+    if run_id not in runs:
+        return None
+    return TelemetryReader(os.path.join(TELEMETRY_DIR, run_id))
+
+@app.get("/runs")
+async def get_runs():
+    summaries = []
+    for run_id in reversed(list_runs(TELEMETRY_DIR)):
+        try:
+            reader = TelemetryReader(os.path.join(TELEMETRY_DIR, run_id))
+        except (OSError, ValueError):
+            continue
+        summaries.append(reader.summary())
+        reader.close()
+    return {"runs": summaries}
+
+@app.get("/runs/{run_id}/weights")
+async def get_run_weights(run_id: str, step: int = None):
+    """
+    Weights of a recorded run as of a step (default: the last one). Steps
+    count batches over the whole run, as in an update's stats.step;
+    stats.batch restarts every epoch.
+    """
+    try:
+        reader = open_run(run_id)
+    except (OSError, ValueError) as e:
+        return {"status": "error", "message": str(e)}
+    if reader is None:
+        return {"status": "error", "message": f"Unknown run: {run_id}"}
+    try:
+        step = reader.last_step if step is None else step
+        arrays = reader.weights_at(step)
+        if arrays is None:
+            return {"status": "error", "message": f"No weights recorded by step {step}"}
+        network = network_from_weights(reader.meta["architecture"], arrays)
+        return {"status": "ok", "run": run_id, "step": step, "weights": serialize_network(network)}
+    finally:
+        reader.close()
+
+@app.post("/replay")
+async def start_replay(body: dict = None):
+    """Body (all optional): {"run": "<id>", "speed": 1.0, "from_step": 0} (see get_run_weights for steps)."""
+    body = body or {}
+    try:
+        speed = max(0.0, float(body.get("speed", 1.0)))
+        from_step = max(0, int(body.get("from_step", 0)))
+    except (TypeError, ValueError) as e:
+        return {"status": "error", "message": str(e)}
+    if training_in_progress or sweep_state["running"]:
+        return {"status": "busy", "message": "Training in progress. Please wait."}
+    try:
+        reader = open_run(body.get("run"))
+    except (OSError, ValueError) as e:
+        return {"status": "error", "message": str(e)}
+    if reader is None:
+        return {"status": "error", "message": "No recorded run available"}
+    if not replay_lock.acquire(blocking=False):
+        reader.close()
+        return {"status": "busy", "message": "A replay is already running."}
+
+    replay_stop.clear()
+    replay_state.update(running=True, run=reader.run_id, speed=speed, step=from_step)
+    manager.loop = asyncio.get_event_loop()
+    threading.Thread(target=replay_loop, args=(reader, reader.seek(from_step), speed), daemon=True).start()
+    return {"status": "started", "run": reader.run_id, "from_step": from_step, "speed": speed}
+
+@app.post("/stop-replay")
+async def stop_replay():
+    replay_stop.set()
+    return {"status": "stopping" if replay_state["running"] else "idle"}
+
 @app.get("/status")
 async def get_status():
     return {
@@ -324,7 +1151,8 @@ async def get_status():
         "epoch": nn_state["epoch"],
         "batch": nn_state["batch"],
         "loss": nn_state["loss"],
-        "accuracy": nn_state["accuracy"]
+        "accuracy": nn_state["accuracy"],
+        "test_accuracy": nn_state["test_accuracy"]
     }
 
 @app.post("/set-learning-rate")
@@ -332,6 +1160,34 @@ async def set_learning_rate(lr: float):
     nn_state["learning_rate"] = lr
     return {"status": "updated", "lr": lr}
 
+def optimizer_settings():
+    return {key: nn_state[key] for key in ("optimizer", "learning_rate", "schedule", "warmup_steps", "target_accuracy")}
+
+@app.post("/set-optimizer")
+async def set_optimizer(body: dict):
+    """
+    Body (all optional): {"optimizer", "learning_rate", "schedule", "warmup_steps", "target_accuracy"}.
+    Applies to the next run; switching optimizer resets the rate to its default unless one is given.
+    """
+    name = body.get("optimizer", nn_state["optimizer"])
+    schedule = body.get("schedule", nn_state["schedule"])
+    if name not in OPTIMIZERS:
+        return {"status": "error", "message": f"optimizer must be one of {list(OPTIMIZERS)}"}
+    if schedule not in SCHEDULES:
+        return {"status": "error", "message": f"schedule must be one of {list(SCHEDULES)}"}
+    try:
+        default_lr = nn_state["learning_rate"] if name == nn_state["optimizer"] else OPTIMIZERS[name][1]
+        learning_rate = float(body.get("learning_rate", default_lr))
+        warmup_steps = max(0, int(body.get("warmup_steps", nn_state["warmup_steps"])))
+        target = float(body.get("target_accuracy", nn_state["target_accuracy"]) or 0)
+    except (TypeError, ValueError) as e:
+        return {"status": "error", "message": str(e)}
+    nn_state.update(
+        optimizer=name, learning_rate=learning_rate, schedule=schedule,
+        warmup_steps=warmup_steps, target_accuracy=target
+    )
+    return {"status": "updated", **optimizer_settings()}
+
 @app.post("/set-batch-delay")
 async def set_batch_delay(ms: int = 0):
     nn_state["batch_delay"] = max(0, ms)
@@ -340,26 +1196,141 @@ async def set_batch_delay(ms: int = 0):
 @app.post("/set-architecture")
 async def set_architecture(body: dict):
     layers = body.get("layers", [784, 128, 64, 10])
-    if len(layers) < 2 or layers[0] != 784 or layers[-1] != 10:
+    if not isinstance(layers, list) or len(layers) < 2 or layers[0] != 784 or layers[-1] != 10:
         return {"status": "error", "message": "Architecture must start with 784 and end with 10"}
+    try:
+        # Also validates layer widths, conv/pool specs and the shapes they
+        # produce, before allocating anything
+        over_budget = check_memory(layers, nn_state["optimizer"])
+        if over_budget:
+            return over_budget
+        # Rebuild network if not currently training
+        network = None if nn_state["training"] else build_network(layers)
+    except (ValueError, TypeError, KeyError) as e:
+        return {"status": "error", "message": f"Invalid architecture: {e}"}
     nn_state["architecture"] = layers
-    # Rebuild network if not currently training
-    if not nn_state["training"]:
-        nn_layers = []
-        for i in range(len(layers) - 1):
-            nn_layers.append(Dense(layers[i], layers[i+1], init_type='he' if i < len(layers)-2 else 'xavier'))
-            if i < len(layers) - 2:
-                nn_layers.append(ReLU())
-            else:
-                nn_layers.append(Softmax())
-        nn_state["network"] = NeuralNetwork(nn_layers)
+    if network is not None:
+        set_network(network)
     return {"status": "updated", "architecture": layers}
 
+def encode_weights_response(network):
+    return json.dumps({"status": "ok", "weights": serialize_network(network)}).encode()
+
+def encode_int8_weights_response(network):
+    return json.dumps({"status": "ok", "format": "int8", "weights": serialize_network(network, int8=True)}).encode()
+
+WEIGHT_FORMATS = {"json": encode_weights_response, "int8": encode_int8_weights_response}
+
 @app.get("/get-weights")
-async def get_weights():
-    if nn_state["network"] is None:
+async def get_weights(request: Request, format: str = "json"):
+    network = nn_state["network"]
+    if network is None:
         return {"status": "error", "message": "No network available"}
-    return {"status": "ok", "weights": serialize_network(nn_state["network"])}
+    if format not in WEIGHT_FORMATS:
+        return {"status": "error", "message": f"format must be one of {list(WEIGHT_FORMATS)}"}
+    session = nn_state["session"]
+
+    # Conditional GET: nothing changed since the client's copy
+    current_etag = SnapshotCache.etag(session, network.version, format)
+    if request.headers.get("if-none-match") == current_etag:
+        return Response(status_code=304, headers={"ETag": current_etag})
+
+    etag, body = await asyncio.to_thread(
+        snapshot_cache.get_or_build, session, network, format, WEIGHT_FORMATS[format]
+    )
+    headers = {"Cache-Control": "no-cache"}
+    if etag:
+        headers["ETag"] = etag
+    return Response(content=body, media_type="application/json", headers=headers)
+
+def evaluate_int8(network, session):
+    quantized = get_quantized_network(network, session)
+    # Calibration images would flatter the int8 model
+    x, y = get_calibration_data(held_out=True)
+    if not len(x):
+        raise ValueError(f"No test images left for evaluation after CALIBRATION_SIZE={CALIBRATION_SIZE}")
+    return compare_quantized(network, quantized, x, y)
+
+@app.post("/set-inference-engine")
+async def set_inference_engine(body: dict):
+    """Body: {"engine": "float" | "int8"}. Switching to int8 reports accuracy/size/latency."""
+    engine = body.get("engine")
+    if engine not in ENGINES:
+        return {"status": "error", "message": f"engine must be one of {list(ENGINES)}"}
+    network = nn_state["network"]
+    report = None
+    if engine == "int8" and network is not None:
+        try:
+            report = await asyncio.to_thread(evaluate_int8, network, nn_state["session"])
+        except ValueError as e:
+            return {"status": "error", "message": str(e)}
+        quantized_model["report"] = report
+    nn_state["engine"] = engine
+    return {"status": "updated", "engine": engine, "report": report}
+
+@app.get("/inference-engine")
+async def get_inference_engine():
+    return {"engine": nn_state["engine"], "report": quantized_model["report"]}
+
+def handle_client_message(websocket: WebSocket, text: str):
+    try:
+        message = json.loads(text)
+    except ValueError:
+        return
+    if not isinstance(message, dict):
+        return
+    if message.get("type") == "hello":
+        # Protocol negotiation; the ack already uses the chosen protocol
+        client = manager.configure(websocket, message.get("protocol"), message.get("precision"))
+        if client:
+            manager.send(websocket, {
+                "type": "hello_ack",
+                "protocol": client.protocol,
+                "precision": client.precision
+            })
+
+@app.post("/predict")
+async def predict(body: dict):
+    network = nn_state["network"]
+    if network is None:
+        return {"status": "error", "message": "No network available"}
+    pixels = body.get("pixels")
+    if not isinstance(pixels, list) or len(pixels) != nn_state["architecture"][0]:
+        return {"status": "error", "message": f"pixels must be a list of {nn_state['architecture'][0]} values in [0, 1]"}
+    with_activations = bool(body.get("activations", False))
+    engine = body.get("engine", nn_state["engine"])
+    if engine not in ENGINES:
+        return {"status": "error", "message": f"engine must be one of {list(ENGINES)}"}
+
+    session = nn_state["session"]
+    model_key = (session, network.version)
+    try:
+        digest, x = prediction_cache.quantize(pixels)
+    except ValueError as e:
+        return {"status": "error", "message": str(e)}
+    variant = (with_activations, engine)
+    cached = prediction_cache.lookup(model_key, digest, variant)
+    if cached is not None:
+        return Response(content=cached, media_type="application/json", headers={"X-Cache": "HIT"})
+
+    model = network
+    if engine == "int8":
+        try:
+            model = await asyncio.to_thread(get_quantized_network, network, session)
+        except ValueError as e:
+            return {"status": "error", "message": str(e)}
+    probabilities, activations = model.infer(x, return_activations=True)
+    result = {
+        "status": "ok",
+        "engine": engine,
+        "prediction": int(np.argmax(probabilities[0])),
+        "probabilities": probabilities[0].tolist()
+    }
+    if with_activations:
+        result["activations"] = [a[0].ravel().tolist() for a in activations]
+    encoded = json.dumps(result).encode()
+    prediction_cache.store(model_key, digest, variant, encoded, len(encoded))
+    return Response(content=encoded, media_type="application/json", headers={"X-Cache": "MISS"})
 
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
@@ -367,13 +1338,13 @@ async def websocket_endpoint(websocket: WebSocket):
     print(f"Client connected. Total: {len(manager.active_connections)}")
     
     try:
-        await websocket.send_text(json.dumps({
+        manager.send(websocket, {
             "type": "connected",
             "status": "ready"
-        }))
+        })
         
         while True:
-            await websocket.receive_text()
+            handle_client_message(websocket, await websocket.receive_text())
             
     except WebSocketDisconnect:
         manager.disconnect(websocket)
@@ -384,7 +1355,13 @@ async def websocket_endpoint(websocket: WebSocket):
 
 import os
 static_dir = os.path.join(os.path.dirname(__file__), "visualizer")
-app.mount("/", StaticFiles(directory=static_dir, html=True), name="visualizer")
+try:
+    # Hashed + precompressed copies; cheap when the build step already ran
+    asset_manifest = build_assets(static_dir, STATIC_BUILD_DIR)
+    app.mount("/", PrecompressedStaticFiles(directory=STATIC_BUILD_DIR, manifest=asset_manifest, html=True), name="visualizer")
+except OSError as e:
+    print(f"Static asset build failed ({e}); serving uncompressed files")
+    app.mount("/", StaticFiles(directory=static_dir, html=True), name="visualizer")
 
 if __name__ == "__main__":
     print("=" * 60)
@@ -392,4 +1369,4 @@ if __name__ == "__main__":
     print("=" * 60)
     print("Access at: http://localhost:8000")
     print("=" * 60)
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    uvicorn.run(app, host="0.0.0.0", port=8000, ws_per_message_deflate=True)
\ No newline at end of file
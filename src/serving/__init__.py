@@ -0,0 +1,4 @@
+from .cache import LRUCache, SnapshotCache, PredictionCache
+from .static_assets import build_assets, PrecompressedStaticFiles
+from .telemetry import TelemetryWriter, TelemetryReader, list_runs
+from .monitor import EventLoopMonitor
@@ -0,0 +1,154 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+class LRUCache:
+    """
+    Thread-safe LRU cache bounded by total bytes (and optionally entries).
+
+    Values are stored together with their size in bytes; the least recently
+    used entries are evicted until both limits hold again.
+    """
+    def __init__(self, max_bytes, max_entries=None):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value, nbytes):
+        # Anything bigger than the whole budget would just flush the cache
+        if nbytes > self.max_bytes:
+            return False
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self.current_bytes -= old[1]
+            self._data[key] = (value, nbytes)
+            self.current_bytes += nbytes
+            while self.current_bytes > self.max_bytes or (
+                self.max_entries is not None and len(self._data) > self.max_entries
+            ):
+                _, (_, size) = self._data.popitem(last=False)
+                self.current_bytes -= size
+                self.evictions += 1
+        return True
+
+    def discard(self, predicate):
+        """Drop every entry whose key matches predicate(key)."""
+        with self._lock:
+            for key in [k for k in self._data if predicate(k)]:
+                _, size = self._data.pop(key)
+                self.current_bytes -= size
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.current_bytes = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._data),
+            "bytes": self.current_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+
+
+class SnapshotCache(LRUCache):
+    """
+    Encoded weight snapshots keyed by (session, version, format).
+
+    A session identifies one network instance; the version is the network's
+    parameter version, so a snapshot never goes stale - newer versions simply
+    get a new key and old ones age out of the LRU.
+    """
+    @staticmethod
+    def etag(session, version, fmt):
+        return f'"w{session}-{version}-{fmt}"'
+
+    def get_or_build(self, session, network, fmt, build):
+        """
+        Return (etag, body) for the network's current version, calling
+        build(network) -> bytes only on a miss.
+        """
+        version = network.version
+        key = (session, version, fmt)
+        body = self.get(key)
+        if body is None:
+            body = build(network)
+            # Training may have stepped while we were serializing, in which
+            # case the body matches no single version: serve it untagged.
+            if network.version != version:
+                return None, body
+            self.put(key, body, len(body))
+        return self.etag(*key), body
+
+
+class PredictionCache(LRUCache):
+    """
+    Inference results keyed by (session, version, quantized input).
+
+    Inputs are quantized to a few grey levels before hashing, so redrawing
+    the same digit with slightly different stroke intensity hits the same
+    entry. Entries belonging to an older parameter version are dropped as
+    soon as a lookup for a newer version comes in.
+    """
+    def __init__(self, max_bytes, max_entries, levels=16):
+        super().__init__(max_bytes, max_entries)
+        self.levels = levels
+        self._model_key = None
+
+    def quantize(self, pixels):
+        """
+        Returns (digest, x) where x is the dequantized (1, n) input that the
+        cached result is computed from. Values are clipped to [0, 1]; raises
+        ValueError unless pixels is a flat sequence of finite numbers.
+        """
+        try:
+            pixels = np.asarray(pixels, dtype=np.float64)
+        except (TypeError, ValueError):
+            raise ValueError("pixels must be numbers") from None
+        if pixels.ndim != 1 or not np.isfinite(pixels).all():
+            raise ValueError("pixels must be a flat list of finite numbers")
+        pixels = np.clip(pixels.reshape(1, -1), 0.0, 1.0)
+        q = np.rint(pixels * (self.levels - 1)).astype(np.uint8)
+        digest = hashlib.blake2b(q.tobytes(), digest_size=16).digest()
+        return digest, q.astype(np.float32) / (self.levels - 1)
+
+    def _roll_version(self, model_key):
+        if model_key != self._model_key:
+            self._model_key = model_key
+            self.discard(lambda key: key[:2] != model_key)
+
+    def lookup(self, model_key, digest, variant):
+        self._roll_version(model_key)
+        return self.get(model_key + (digest, variant))
+
+    def store(self, model_key, digest, variant, value, nbytes):
+        # If training stepped while this was computed, the entry is keyed to
+        # a version that is already stale and will simply never be hit.
+        return self.put(model_key + (digest, variant), value, nbytes)
@@ -0,0 +1,245 @@
+"""
+Memory accounting for the server.
+
+Byte counts are gathered on demand from the objects that hold memory
+(dataset arrays, network parameters, optimizer buffers, cached layer
+activations, WebSocket queues, caches), so the accounting itself costs
+nothing between requests. tracemalloc is only switched on when asked
+for, since it slows every allocation down.
+
+estimate_training_bytes() predicts the footprint of a training run from
+the architecture alone, so the server can refuse runs that would not fit
+in its memory budget before allocating anything.
+"""
+import os
+import sys
+import tracemalloc
+
+import numpy as np
+
+from network.builder import plan_network
+from network.layers import Dense
+from network.conv import Conv2D, MaxPool2D
+from network.optimizer import AdaptiveOptimizer, Adam, RMSProp
+
+# MNIST as held by a training run (see data.loader.preprocess_data)
+MNIST_TRAIN = 60000
+MNIST_TEST = 10000
+MNIST_PIXELS = 784
+MNIST_CLASSES = 10
+
+FLOAT_BYTES = 8  # parameters, gradients and activations are float64
+# RSS of a sweep worker before it loads any data: the interpreter, NumPy
+# and the training modules (about 42 MB measured)
+WORKER_BASE_BYTES = 48 * 2 ** 20
+
+
+def container_limit():
+    """Memory limit of the cgroup the process runs in, or None."""
+    for path in ("/sys/fs/cgroup/memory.max", "/sys/fs/cgroup/memory/memory.limit_in_bytes"):
+        try:
+            with open(path) as f:
+                value = f.read().strip()
+        except OSError:
+            continue
+        # cgroup v1 reports "no limit" as a huge number
+        if value.isdigit() and int(value) < 2 ** 60:
+            return int(value)
+    return None
+
+
+def rss_bytes():
+    """Current resident set size, or None where it can't be read."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def peak_rss_bytes():
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def deep_nbytes(obj, seen=None):
+    """
+    Bytes held by numpy arrays, bytes and strings inside nested containers.
+    Pass the same `seen` set to several calls to count shared objects once.
+    """
+    seen = set() if seen is None else seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    if isinstance(obj, np.ndarray):
+        if obj.base is None:
+            return obj.nbytes
+        # A view counts as the array owning its data; memory maps count nothing
+        root = obj
+        while isinstance(root.base, np.ndarray):
+            root = root.base
+        if root is obj:
+            return deep_nbytes(obj.base, seen) if isinstance(obj.base, (bytes, bytearray)) else 0
+        return deep_nbytes(root, seen)
+    if isinstance(obj, (bytes, bytearray, str)):
+        return len(obj)
+    if isinstance(obj, dict):
+        return sum(deep_nbytes(v, seen) for v in obj.values())
+    if isinstance(obj, (list, tuple, set)):
+        return sum(deep_nbytes(v, seen) for v in obj)
+    return 0
+
+
+def network_bytes(network, optimizer=None):
+    """
+    Bytes of a network by role: parameters, gradients, optimizer state
+    (the layers' momentum buffers plus the optimizer's own buffers) and
+    the activations cached by the last forward/backward pass.
+    """
+    report = {"parameters": 0, "gradients": 0, "optimizer_state": 0, "activations": 0}
+    if network is None:
+        return report
+    # One layer's output is the next one's input
+    seen = set()
+    for layer in network.layers:
+        for key in ("weights", "bias", "data", "indices", "indptr"):
+            report["parameters"] += deep_nbytes(getattr(layer, key, None), seen)
+        for key in ("weights_grad", "bias_grad"):
+            report["gradients"] += deep_nbytes(getattr(layer, key, None), seen)
+        for key in ("weights_m", "bias_m"):
+            report["optimizer_state"] += deep_nbytes(getattr(layer, key, None), seen)
+        for key in ("input", "output", "_cols", "_argmax"):
+            report["activations"] += deep_nbytes(getattr(layer, key, None), seen)
+    if isinstance(optimizer, AdaptiveOptimizer):
+        report["optimizer_state"] += deep_nbytes(optimizer.buffers, seen) + optimizer._scratch.nbytes
+    return report
+
+
+def queue_bytes(messages):
+    """Bytes of queued OutboundMessages (payloads plus memoized encodings), each counted once."""
+    seen = set()
+    total = 0
+    for message in messages:
+        if id(message) not in seen:
+            seen.add(id(message))
+            total += deep_nbytes(message.payload, seen) + deep_nbytes(message._encoded, seen)
+    return total
+
+
+def estimate_training_bytes(architecture, batch_size, optimizer="sgd"):
+    """
+    Predicted peak bytes of a training run, by subsystem, without building
+    the network. Raises ValueError for invalid architectures.
+    """
+    params = largest = activations = 0
+    for cls, kwargs, shape in plan_network(architecture):
+        size = int(np.prod(shape))
+        if cls is Dense:
+            count = kwargs["input_size"] * kwargs["output_size"] + kwargs["output_size"]
+        elif cls is Conv2D:
+            k = kwargs["kernel_size"]
+            count = (k * k * kwargs["in_channels"] + 1) * kwargs["out_channels"]
+            # The im2col window matrix is cached for backward
+            activations += batch_size * shape[0] * shape[1] * k * k * kwargs["in_channels"] * FLOAT_BYTES
+        else:
+            count = 0
+            if cls is MaxPool2D:
+                activations += batch_size * size * 8  # int64 argmax
+        params += count
+        largest = max(largest, count)
+        # Cached output plus the gradient flowing back through the layer
+        activations += 2 * batch_size * size * FLOAT_BYTES
+
+    # Layers always hold momentum buffers; Adam keeps two moments, RMSProp
+    # one, both plus a scratch array the size of the largest parameter
+    slots = 1 + {"adam": len(Adam.slots), "adamw": len(Adam.slots), "rmsprop": len(RMSProp.slots)}.get(optimizer, 0)
+    optimizer_state = slots * params * FLOAT_BYTES + (largest * FLOAT_BYTES if slots > 1 else 0)
+
+    dataset = (
+        MNIST_TRAIN * MNIST_PIXELS * 4 + MNIST_TRAIN * MNIST_CLASSES * FLOAT_BYTES  # float32 images, one-hot labels
+        + MNIST_TEST * (MNIST_PIXELS + 1)  # raw uint8 test set
+        + MNIST_TRAIN * MNIST_PIXELS  # raw uint8 training images, alive while preprocessing
+    )
+    report = {
+        "dataset": dataset,
+        "parameters": params * FLOAT_BYTES,
+        "gradients": params * FLOAT_BYTES,
+        "optimizer_state": optimizer_state,
+        "activations": activations
+    }
+    report["total"] = sum(report.values())
+    return report
+
+
+def estimate_sweep_bytes(configs, workers):
+    """
+    Predicted peak bytes of a sweep. Every worker process loads its own
+    copy of MNIST and trains one trial at a time, so each needs room for
+    the largest trial.
+    """
+    per_worker = WORKER_BASE_BYTES + max(
+        estimate_training_bytes(config["architecture"], config["batch_size"])["total"]
+        for config in configs
+    )
+    return {"workers": workers, "per_worker": per_worker, "total": workers * per_worker}
+
+
+def start_tracing(frames=1):
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(frames)
+
+
+def stop_tracing():
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+
+def tracing_report(limit=10):
+    """Traced totals and the top allocation sites (None when not tracing)."""
+    if not tracemalloc.is_tracing():
+        return None
+    current, peak = tracemalloc.get_traced_memory()
+    snapshot = tracemalloc.take_snapshot().filter_traces([
+        tracemalloc.Filter(False, tracemalloc.__file__)
+    ])
+    return {
+        "current": current,
+        "peak": peak,
+        "top": [
+            {"where": str(stat.traceback), "bytes": stat.size, "count": stat.count}
+            for stat in snapshot.statistics("lineno")[:limit]
+        ]
+    }
+
+
+class MemoryBudget:
+    """
+    Budget for the process's memory. check() compares an estimate with
+    what is left: the budget minus the current RSS, plus whatever the new
+    work would release (e.g. the network it replaces).
+    """
+    def __init__(self, budget_bytes=None):
+        self.budget = budget_bytes
+        self.rejected = 0
+
+    def available(self, releasable=0):
+        if self.budget is None:
+            return None
+        rss = rss_bytes()
+        return self.budget - (rss or 0) + releasable
+
+    def check(self, estimate, releasable=0):
+        """(ok, available bytes); always ok without a budget or an RSS reading."""
+        available = self.available(releasable)
+        ok = available is None or estimate <= available
+        if not ok:
+            self.rejected += 1
+        return ok, available
+
+    def stats(self):
+        return {"budget": self.budget, "available": self.available(), "rejected": self.rejected}
@@ -0,0 +1,58 @@
+"""
+Event-loop lag monitoring.
+
+A task sleeps for a fixed interval and records how much later than asked
+it woke up. Anything that blocks the loop (a slow handler, JSON encoding
+of a large frame, a synchronous call that should have been offloaded)
+shows up as lag, and every WebSocket client waits that long too.
+"""
+import asyncio
+import time
+from collections import deque
+
+import numpy as np
+
+
+class EventLoopMonitor:
+    """Samples the lag of the running event loop; start() from inside the loop."""
+
+    def __init__(self, interval=0.1, window=600):
+        self.interval = interval
+        self.samples = deque(maxlen=window)
+        self.max_lag = 0.0
+        self._task = None
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.perf_counter() - start - self.interval)
+            self.samples.append(lag)
+            self.max_lag = max(self.max_lag, lag)
+
+    def stats(self):
+        """Lag in milliseconds over the last `window` samples (max since start)."""
+        if not self.samples:
+            return {"interval_ms": self.interval * 1000, "samples": 0}
+        lags = np.array(self.samples) * 1000
+        return {
+            "interval_ms": self.interval * 1000,
+            "samples": len(lags),
+            "last_ms": round(float(lags[-1]), 3),
+            "mean_ms": round(float(lags.mean()), 3),
+            "p99_ms": round(float(np.percentile(lags, 99)), 3),
+            "max_ms": round(self.max_lag * 1000, 3)
+        }
@@ -0,0 +1,213 @@
+"""
+Encoding of server -> client WebSocket messages.
+
+Two wire formats are supported:
+
+- "json": the original text frames. Large frames rely on the transport's
+  permessage-deflate extension for compression.
+- "binary": a compact frame negotiated with a {"type": "hello"} message.
+  Activation arrays are sent as raw float32, float16 or uint8-quantized
+  values instead of JSON float lists.
+
+Binary frame layout (little-endian):
+
+    frame   := "NV" version:u8 count:u8 message{count}
+    message := meta_len:u32 meta:utf8-json n_arrays:u16 array{n_arrays}
+    array   := dtype:u8 length:u32 [lo:f32 scale:f32]? data
+
+meta is the message without its "activations" key; lo/scale are only
+present for uint8 arrays (value = lo + q * scale).
+
+Several messages queued for one client in the same event-loop tick are
+coalesced into a single frame ({"type": "batch"} for JSON, count > 1 for
+binary).
+
+Constrained clients can be sent a reduced level of detail (see
+DETAIL_LEVELS): fewer neurons per layer, fewer layers and lower precision.
+"""
+import json
+import struct
+
+import numpy as np
+
+PROTOCOL_JSON = "json"
+PROTOCOL_BINARY = "binary"
+PROTOCOLS = (PROTOCOL_JSON, PROTOCOL_BINARY)
+
+PRECISIONS = ("f32", "f16", "u8")
+_DTYPE_CODES = {"f32": 0, "f16": 1, "u8": 2}
+
+# Per detail level: (neurons kept per layer, keep every layer,
+# coarsest binary precision, decimals kept in JSON floats)
+DETAIL_LEVELS = (
+    (None, True, "f32", None),
+    (50, True, "f16", 3),
+    (25, False, "u8", 2),
+)
+MAX_DETAIL = len(DETAIL_LEVELS) - 1
+
+MAGIC = b"NV"
+VERSION = 1
+MAX_MESSAGES_PER_FRAME = 255
+
+
+def _json_default(obj):
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def to_json(payload):
+    return json.dumps(payload, default=_json_default)
+
+
+def quantize_u8(values):
+    lo = float(values.min()) if values.size else 0.0
+    hi = float(values.max()) if values.size else 0.0
+    scale = (hi - lo) / 255 if hi > lo else 1.0
+    q = np.rint((values - lo) / scale).astype(np.uint8)
+    return lo, scale, q
+
+
+def encode_array(values, precision):
+    values = np.asarray(values, dtype=np.float32).ravel()
+    header = struct.pack("<BI", _DTYPE_CODES[precision], values.size)
+    if precision == "f16":
+        return header + values.astype("<f2").tobytes()
+    if precision == "u8":
+        lo, scale, q = quantize_u8(values)
+        return header + struct.pack("<ff", lo, scale) + q.tobytes()
+    return header + values.astype("<f4").tobytes()
+
+
+def lower_precision(precision, detail):
+    """The coarser of the client's precision and the detail level's cap."""
+    cap = DETAIL_LEVELS[detail][2]
+    return max(precision, cap, key=PRECISIONS.index)
+
+
+def reduce_detail(payload, detail, protocol):
+    """
+    Return payload trimmed to a detail level. Dropped layers are sent as
+    empty arrays so clients can keep indexing activations by layer.
+    payload["activation_layers"] lists the activation-function outputs kept
+    at reduced detail; without it every layer is kept.
+    """
+    activations = payload.get("activations")
+    if not detail or not activations:
+        return payload
+    neurons, keep_all, _, decimals = DETAIL_LEVELS[detail]
+    keep = payload.get("activation_layers")
+    if keep_all or keep is None:
+        keep = range(len(activations))
+    keep = set(keep)
+    reduced = []
+    for i, values in enumerate(activations):
+        if i not in keep:
+            reduced.append(np.zeros(0, dtype=np.float32))
+            continue
+        values = np.asarray(values, dtype=np.float32)[:neurons]
+        if protocol == PROTOCOL_JSON and decimals is not None:
+            values = np.round(values, decimals)
+        reduced.append(values)
+    return dict(payload, activations=reduced)
+
+
+def encode_binary_message(payload, precision="f16", key="activations"):
+    """Encode payload[key] as arrays and the rest of payload as JSON meta."""
+    arrays = payload.get(key) or []
+    meta = {k: v for k, v in payload.items() if k != key}
+    meta_bytes = to_json(meta).encode("utf-8")
+    parts = [struct.pack("<I", len(meta_bytes)), meta_bytes, struct.pack("<H", len(arrays))]
+    parts.extend(encode_array(a, precision) for a in arrays)
+    return b"".join(parts)
+
+
+class OutboundMessage:
+    """
+    A message waiting to be sent, with its encodings memoized so a broadcast
+    to N clients encodes it once per wire format rather than N times.
+    """
+    __slots__ = ("payload", "_encoded")
+
+    def __init__(self, payload):
+        self.payload = payload
+        self._encoded = {}
+
+    @property
+    def type(self):
+        return self.payload.get("type")
+
+    def encode(self, protocol, precision="f32", detail=0):
+        if protocol != PROTOCOL_JSON:
+            precision = lower_precision(precision, detail)
+        key = (PROTOCOL_JSON if protocol == PROTOCOL_JSON else precision, detail)
+        data = self._encoded.get(key)
+        if data is None:
+            payload = reduce_detail(self.payload, detail, protocol)
+            if protocol == PROTOCOL_JSON:
+                data = to_json(payload)
+            else:
+                data = encode_binary_message(payload, precision)
+            self._encoded[key] = data
+        return data
+
+
+def encode_frame(messages, protocol, precision="f32", detail=0):
+    """
+    Coalesce one or more OutboundMessages into a single frame.
+    Returns str for JSON and bytes for the binary protocol.
+    """
+    if protocol == PROTOCOL_JSON:
+        if len(messages) == 1:
+            return messages[0].encode(protocol, detail=detail)
+        return '{"type": "batch", "messages": [' + ", ".join(
+            m.encode(protocol, detail=detail) for m in messages
+        ) + ']}'
+    header = MAGIC + struct.pack("<BB", VERSION, len(messages))
+    return header + b"".join(m.encode(protocol, precision, detail) for m in messages)
+
+
+def decode_binary_frame(data):
+    """Inverse of encode_frame for the binary protocol (used by tools/tests)."""
+    if data[:2] != MAGIC:
+        raise ValueError("Not a binary frame")
+    version, count = struct.unpack_from("<BB", data, 2)
+    if version != VERSION:
+        raise ValueError(f"Unsupported frame version {version}")
+    offset = 4
+    messages = []
+    for _ in range(count):
+        message, offset = decode_binary_message(data, offset)
+        messages.append(message)
+    return messages
+
+
+def decode_binary_message(data, offset=0, key="activations"):
+    """Inverse of encode_binary_message; returns (payload, end offset)."""
+    (meta_len,) = struct.unpack_from("<I", data, offset)
+    offset += 4
+    message = json.loads(bytes(data[offset:offset + meta_len]).decode("utf-8"))
+    offset += meta_len
+    (n_arrays,) = struct.unpack_from("<H", data, offset)
+    offset += 2
+    arrays = []
+    for _ in range(n_arrays):
+        code, length = struct.unpack_from("<BI", data, offset)
+        offset += 5
+        if code == _DTYPE_CODES["u8"]:
+            lo, scale = struct.unpack_from("<ff", data, offset)
+            offset += 8
+            q = np.frombuffer(data, dtype=np.uint8, count=length, offset=offset)
+            arrays.append(lo + q.astype(np.float32) * scale)
+            offset += length
+        else:
+            dtype = "<f2" if code == _DTYPE_CODES["f16"] else "<f4"
+            arr = np.frombuffer(data, dtype=dtype, count=length, offset=offset)
+            arrays.append(arr.astype(np.float32))
+            offset += arr.nbytes
+    if n_arrays:
+        message[key] = arrays
+    return message, offset
@@ -0,0 +1,191 @@
+"""
+Build and serve precompressed, content-hashed copies of the visualizer.
+
+build_assets() copies every asset to "<name>.<hash><ext>", writes .gz (and
+.br when the brotli package is installed) variants of the text files, and
+rewrites index.html to reference the hashed names. Hashed files never change,
+so they can be cached forever by browsers; index.html is always revalidated.
+
+Run it ahead of time (e.g. as the deploy build step) with:
+
+    cd src && python -m serving.static_assets
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import sys
+
+from starlette.datastructures import Headers
+from starlette.staticfiles import StaticFiles
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+ASSET_EXTENSIONS = ('.js', '.css', '.png', '.ico', '.svg')
+COMPRESSIBLE_EXTENSIONS = ('.js', '.css', '.html', '.svg')
+# Compression is pointless for tiny files
+MIN_COMPRESS_BYTES = 512
+
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE = "no-cache"
+
+MANIFEST_NAME = "manifest.json"
+DEFAULT_BUILD_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "build", "static")
+
+# src="..." / href="..." attributes pointing at a local file
+_REF_PATTERN = re.compile(r'(\b(?:src|href)=")([^":?#]+)(")')
+
+
+def _write_if_changed(path, data):
+    if os.path.exists(path):
+        with open(path, 'rb') as f:
+            if f.read() == data:
+                return
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _write_with_variants(out_dir, name, data, immutable=False):
+    """Write a file plus its compressed variants; returns all written names."""
+    written = [name]
+    _write_if_changed(os.path.join(out_dir, name), data)
+    if name.endswith(COMPRESSIBLE_EXTENSIONS) and len(data) >= MIN_COMPRESS_BYTES:
+        variants = [(".gz", lambda: gzip.compress(data, compresslevel=9, mtime=0))]
+        if brotli is not None:
+            variants.append((".br", lambda: brotli.compress(data, quality=11)))
+        for suffix, compress in variants:
+            path = os.path.join(out_dir, name + suffix)
+            # A hashed name pins the content, so an existing variant is right
+            if not (immutable and os.path.exists(path)):
+                _write_if_changed(path, compress())
+            written.append(name + suffix)
+    return written
+
+
+def hashed_name(name, data):
+    stem, ext = os.path.splitext(name)
+    digest = hashlib.sha256(data).hexdigest()[:12]
+    return f"{stem}.{digest}{ext}"
+
+
+def rewrite_references(html, manifest):
+    def replace(match):
+        ref = match.group(2)
+        return match.group(1) + manifest.get(ref, ref) + match.group(3)
+    return _REF_PATTERN.sub(replace, html)
+
+
+def _manifest_files(out_dir):
+    """Names the build recorded in out_dir's manifest wrote, with their variants."""
+    try:
+        with open(os.path.join(out_dir, MANIFEST_NAME), 'r', encoding='utf-8') as f:
+            previous = json.load(f)
+    except (OSError, ValueError):
+        return set()
+    if not isinstance(previous, dict):
+        return set()
+    names = set()
+    for name, hashed in previous.items():
+        for base in (name, hashed):
+            # Never follow a manifest entry out of out_dir
+            if isinstance(base, str) and os.path.basename(base) == base:
+                names.update(base + suffix for suffix in ("", ".gz", ".br"))
+    return names
+
+
+def build_assets(src_dir, out_dir=DEFAULT_BUILD_DIR):
+    """
+    Build the hashed/precompressed asset tree in out_dir.
+
+    Returns the manifest mapping original file names to hashed names. The
+    original names are kept as well (revalidated on every use) for anything
+    that still links to them. Files the previous build's manifest lists and
+    this build no longer writes are removed; nothing else in out_dir is
+    touched.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    previous = _manifest_files(out_dir)
+    manifest = {}
+    keep = {MANIFEST_NAME}
+
+    for name in sorted(os.listdir(src_dir)):
+        path = os.path.join(src_dir, name)
+        if not os.path.isfile(path) or not name.endswith(ASSET_EXTENSIONS):
+            continue
+        with open(path, 'rb') as f:
+            data = f.read()
+        manifest[name] = hashed_name(name, data)
+        keep.update(_write_with_variants(out_dir, manifest[name], data, immutable=True))
+        keep.update(_write_with_variants(out_dir, name, data))
+
+    with open(os.path.join(src_dir, "index.html"), 'r', encoding='utf-8') as f:
+        html = rewrite_references(f.read(), manifest)
+    keep.update(_write_with_variants(out_dir, "index.html", html.encode('utf-8')))
+
+    _write_if_changed(
+        os.path.join(out_dir, MANIFEST_NAME),
+        json.dumps(manifest, indent=2, sort_keys=True).encode('utf-8')
+    )
+    for name in previous - keep:
+        if os.path.isfile(os.path.join(out_dir, name)):
+            os.remove(os.path.join(out_dir, name))
+    return manifest
+
+
+def accepted_encodings(header):
+    """Parse an Accept-Encoding header into the set of acceptable codings."""
+    accepted = set()
+    for part in header.split(","):
+        coding, _, params = part.strip().partition(";")
+        params = params.replace(" ", "")
+        if coding and params not in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            accepted.add(coding.strip().lower())
+    return accepted
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    """
+    StaticFiles that serves .br/.gz variants according to Accept-Encoding
+    and marks content-hashed files as immutable.
+    """
+    def __init__(self, *, directory, manifest, **kwargs):
+        super().__init__(directory=directory, **kwargs)
+        self.immutable_names = set(manifest.values())
+
+    async def get_response(self, path, scope):
+        name = "index.html" if path in ("", ".") else path
+        accepted = accepted_encodings(Headers(scope=scope).get("accept-encoding", ""))
+
+        response = None
+        for coding, suffix in (("br", ".br"), ("gzip", ".gz")):
+            if coding in accepted and os.path.isfile(os.path.join(self.directory, name + suffix)):
+                response = await super().get_response(name + suffix, scope)
+                media_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+                if media_type.startswith("text/"):
+                    media_type += "; charset=utf-8"
+                response.headers["Content-Encoding"] = coding
+                response.headers["Content-Type"] = media_type
+                break
+        if response is None:
+            response = await super().get_response(path, scope)
+
+        if name.endswith(COMPRESSIBLE_EXTENSIONS):
+            response.headers["Vary"] = "Accept-Encoding"
+        response.headers["Cache-Control"] = (
+            IMMUTABLE_CACHE if name in self.immutable_names else REVALIDATE_CACHE
+        )
+        return response
+
+
+if __name__ == "__main__":
+    source = sys.argv[1] if len(sys.argv) > 1 else os.path.join(os.path.dirname(__file__), "..", "visualizer")
+    target = sys.argv[2] if len(sys.argv) > 2 else DEFAULT_BUILD_DIR
+    built = build_assets(source, target)
+    print(f"Built {len(built)} assets into {os.path.abspath(target)} (brotli: {'yes' if brotli else 'no'})")
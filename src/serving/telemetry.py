@@ -0,0 +1,250 @@
+"""
+Append-only binary telemetry logs of training runs, for replay without
+retraining.
+
+Each run is two files in the telemetry directory:
+
+    <run>.ntl   "NTL" version:u8, then records
+    <run>.idx   one fixed-size index entry per record (INDEX_DTYPE)
+
+    record := kind:u8 step:u32 time:f64 length:u32 body
+
+body is a binary protocol message (serving.protocol.encode_binary_message):
+JSON meta plus arrays. step is the run's batch counter; the index lets a
+reader seek to a batch with a binary search instead of scanning the log.
+
+Weights are logged as keyframes (float32) and deltas (uint8-quantized,
+relative to the last keyframe rather than the previous delta so errors
+don't accumulate). Any step is reconstructed from one keyframe and at most
+one delta.
+
+Readers memory-map both files, so replaying a run costs no more than
+copying the records being sent.
+"""
+import mmap
+import os
+import struct
+import time
+
+import numpy as np
+
+from .protocol import encode_binary_message, decode_binary_message
+
+MAGIC = b"NTL"
+VERSION = 1
+LOG_EXT = ".ntl"
+INDEX_EXT = ".idx"
+
+KIND_START = 0
+KIND_UPDATE = 1
+KIND_PAUSE = 2
+KIND_COMPLETE = 3
+KIND_KEYFRAME = 4
+KIND_DELTA = 5
+# Records replayed to clients, as opposed to the weight records
+MESSAGE_KINDS = (KIND_UPDATE, KIND_PAUSE, KIND_COMPLETE)
+MESSAGE_KIND_BY_TYPE = {
+    "update": KIND_UPDATE,
+    "pause_moment": KIND_PAUSE,
+    "training_complete": KIND_COMPLETE
+}
+
+RECORD_HEADER = struct.Struct("<BIdI")
+INDEX_DTYPE = np.dtype([("step", "<u4"), ("kind", "u1"), ("offset", "<u8")])
+
+
+def weight_arrays(network):
+    """float32 copies of every layer's weights and bias, in layer order."""
+    arrays = []
+    for layer in network.layers:
+        if getattr(layer, "weights", None) is not None:
+            arrays.append(np.asarray(layer.weights, dtype=np.float32).copy())
+            arrays.append(np.asarray(layer.bias, dtype=np.float32).copy())
+    return arrays
+
+
+class TelemetryWriter:
+    """Appends one run's records. Used from the training thread only."""
+
+    def __init__(self, path, meta):
+        self.path = path
+        self.run_id = os.path.basename(path)
+        is_new = not os.path.exists(path + LOG_EXT)
+        self._log = open(path + LOG_EXT, "ab")
+        self._index = open(path + INDEX_EXT, "ab")
+        if is_new:
+            self._log.write(MAGIC + bytes([VERSION]))
+        self._offset = self._log.tell()
+        self._keyframe = None
+        self._keyframe_step = None
+        self.records = 0
+        self.bytes_written = 0
+        self.log(KIND_START, 0, dict(meta, type="run_start"))
+
+    @classmethod
+    def create(cls, directory, meta, keep=None):
+        """Start a new run log in directory, keeping at most `keep` runs."""
+        os.makedirs(directory, exist_ok=True)
+        now = time.time()
+        # Names sort oldest to newest, which retention relies on
+        run_id = time.strftime("run-%Y%m%d-%H%M%S", time.localtime(now)) + f"-{int(now * 1e6) % 1000000:06d}"
+        path = os.path.join(directory, run_id)
+        suffix = 1
+        while os.path.exists(path + LOG_EXT):
+            suffix += 1
+            path = os.path.join(directory, f"{run_id}-{suffix}")
+        if keep:
+            runs = list_runs(directory)
+            for old in runs[:max(0, len(runs) - (keep - 1))]:
+                for ext in (LOG_EXT, INDEX_EXT):
+                    try:
+                        os.remove(os.path.join(directory, old + ext))
+                    except OSError:
+                        pass
+        return cls(path, meta)
+
+    def log(self, kind, step, payload, precision="f16", key="activations"):
+        body = encode_binary_message(payload, precision, key)
+        self._log.write(RECORD_HEADER.pack(kind, step, time.time(), len(body)))
+        self._log.write(body)
+        self._index.write(np.array([(step, kind, self._offset)], dtype=INDEX_DTYPE).tobytes())
+        size = RECORD_HEADER.size + len(body)
+        self._offset += size
+        self.bytes_written += size
+        self.records += 1
+
+    def log_message(self, step, payload):
+        """Log a WebSocket message (update, pause_moment, training_complete)."""
+        self.log(MESSAGE_KIND_BY_TYPE[payload["type"]], step, payload)
+
+    def log_weights(self, step, network, keyframe=False):
+        arrays = weight_arrays(network)
+        shapes = [list(a.shape) for a in arrays]
+        if keyframe or self._keyframe is None or shapes != [list(a.shape) for a in self._keyframe]:
+            self._keyframe, self._keyframe_step = arrays, step
+            self.log(KIND_KEYFRAME, step, {"type": "keyframe", "shapes": shapes, "arrays": arrays}, "f32", "arrays")
+            # A keyframe is a natural point to make the log visible to readers
+            self.flush()
+        else:
+            deltas = [a - k for a, k in zip(arrays, self._keyframe)]
+            self.log(KIND_DELTA, step, {
+                "type": "delta", "keyframe": self._keyframe_step, "shapes": shapes, "arrays": deltas
+            }, "u8", "arrays")
+
+    def flush(self):
+        # Log before index, so an index entry never points past the log
+        self._log.flush()
+        self._index.flush()
+
+    def close(self):
+        if not self._log.closed:
+            self.flush()
+            self._log.close()
+            self._index.close()
+
+    def stats(self):
+        return {"run": self.run_id, "records": self.records, "bytes": self.bytes_written}
+
+
+class TelemetryReader:
+    """Random access to a run log through memory maps of the log and index."""
+
+    def __init__(self, path):
+        self.path = path
+        self.run_id = os.path.basename(path)
+        with open(path + LOG_EXT, "rb") as f:
+            if f.read(4) != MAGIC + bytes([VERSION]):
+                raise ValueError(f"Not a version {VERSION} telemetry log: {path + LOG_EXT}")
+            self._log = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        n = os.path.getsize(path + INDEX_EXT) // INDEX_DTYPE.itemsize
+        if n:
+            index = np.memmap(path + INDEX_EXT, dtype=INDEX_DTYPE, mode="r", shape=(n,))
+        else:
+            index = np.zeros(0, dtype=INDEX_DTYPE)
+        # A run still being written may have index entries past the mapped log
+        while n and self._record_end(int(index["offset"][n - 1])) > len(self._log):
+            n -= 1
+        self.index = index[:n]
+        self.meta = self.record(0)[3] if len(self.index) else {}
+
+    def _record_end(self, offset):
+        if offset + RECORD_HEADER.size > len(self._log):
+            return offset + RECORD_HEADER.size
+        length = RECORD_HEADER.unpack_from(self._log, offset)[3]
+        return offset + RECORD_HEADER.size + length
+
+    def __len__(self):
+        return len(self.index)
+
+    @property
+    def last_step(self):
+        return int(self.index["step"][-1]) if len(self.index) else 0
+
+    def seek(self, step):
+        """Position of the first record at or after step."""
+        return int(np.searchsorted(self.index["step"], step, side="left"))
+
+    def record(self, i):
+        """(kind, step, time, payload) of the i-th record."""
+        offset = int(self.index["offset"][i])
+        kind, step, ts, length = RECORD_HEADER.unpack_from(self._log, offset)
+        start = offset + RECORD_HEADER.size
+        body = self._log[start:start + length]
+        key = "arrays" if kind in (KIND_KEYFRAME, KIND_DELTA) else "activations"
+        payload, _ = decode_binary_message(body, 0, key)
+        return kind, step, ts, payload
+
+    def messages(self, start=0):
+        """Yield (step, time, payload) for the replayable records from start on."""
+        kinds = self.index["kind"]
+        for i in range(start, len(self.index)):
+            if kinds[i] in MESSAGE_KINDS:
+                _, step, ts, payload = self.record(i)
+                yield step, ts, payload
+
+    def weights_at(self, step):
+        """
+        Weight arrays as of step (the latest keyframe/delta at or before it),
+        or None if no weights were logged by then.
+        """
+        end = np.searchsorted(self.index["step"], step, side="right")
+        kinds = self.index["kind"][:end]
+        keyframes = np.flatnonzero(kinds == KIND_KEYFRAME)
+        if not len(keyframes):
+            return None
+        k = int(keyframes[-1])
+        deltas = np.flatnonzero(kinds[k:] == KIND_DELTA)
+        _, _, _, keyframe = self.record(k)
+        arrays = [a.reshape(shape) for a, shape in zip(keyframe["arrays"], keyframe["shapes"])]
+        if len(deltas):
+            _, _, _, delta = self.record(k + int(deltas[-1]))
+            arrays = [a + d.reshape(a.shape) for a, d in zip(arrays, delta["arrays"])]
+        return arrays
+
+    def summary(self):
+        kinds = self.index["kind"]
+        return {
+            "run": self.run_id,
+            "architecture": self.meta.get("architecture"),
+            "started": self.meta.get("started"),
+            "records": len(self.index),
+            "updates": int(np.count_nonzero(kinds == KIND_UPDATE)),
+            "keyframes": int(np.count_nonzero(kinds == KIND_KEYFRAME)),
+            "completed": bool(np.count_nonzero(kinds == KIND_COMPLETE)),
+            "last_step": self.last_step,
+            "bytes": len(self._log)
+        }
+
+    def close(self):
+        # Record bodies are copied out of the map, so nothing refers to it
+        self.index = np.zeros(0, dtype=INDEX_DTYPE)
+        self._log.close()
+
+
+def list_runs(directory):
+    """Run ids in directory, oldest first."""
+    try:
+        names = os.listdir(directory)
+    except OSError:
+        return []
+    return sorted(n[:-len(LOG_EXT)] for n in names if n.endswith(LOG_EXT))
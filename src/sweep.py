@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+Hyperparameter / architecture sweeps over the MNIST MLP.
+
+Trials (architecture, learning rate, momentum, batch size) come from a grid
+or a random search and run on a process pool, each worker pinned to a fixed
+number of BLAS threads. Successive halving stops hopeless trials early:
+every rung trains the surviving trials for eta times more batches than the
+last and keeps the best 1/eta of them by validation accuracy. Surviving
+trials resume from where they stopped instead of starting over.
+
+Every finished (trial, rung) is appended to a JSON-lines results file.
+
+Usage (from src/):
+    python sweep.py --search random --trials 16 --workers 4 --threads 1
+"""
+import argparse
+import concurrent.futures
+import itertools
+import json
+import multiprocessing
+import os
+import random
+import time
+
+import numpy as np
+
+from network import CrossEntropy, SGD, build_network
+from network.threads import limit_blas_threads, pinned_env
+from data.loader import download_mnist, load_mnist, preprocess_data, get_batches
+from train_mnist import compute_accuracy
+
+DEFAULT_SPACE = {
+    "architecture": [[784, 64, 10], [784, 128, 64, 10], [784, 256, 10], [784, 256, 128, 10]],
+    "learning_rate": [0.005, 0.01, 0.05, 0.1],
+    "momentum": [0.0, 0.5, 0.9],
+    "batch_size": [32, 64, 128],
+}
+
+# Held out from the training images for ranking trials
+VALIDATION_SIZE = 5000
+
+def grid_search(space):
+    keys = list(space)
+    return [dict(zip(keys, values)) for values in itertools.product(*(space[k] for k in keys))]
+
+def random_search(space, trials, seed=None):
+    rng = random.Random(seed)
+    configs = []
+    for _ in range(trials):
+        configs.append({key: rng.choice(values) for key, values in space.items()})
+    return configs
+
+def validate_config(config):
+    arch = config["architecture"]
+    if len(arch) < 2 or arch[0] != 784 or arch[-1] != 10:
+        raise ValueError(f"Architecture must start with 784 and end with 10: {arch}")
+    if config["batch_size"] < 1 or config["learning_rate"] <= 0:
+        raise ValueError(f"Invalid config: {config}")
+
+# ---------------------------------------------------------------------------
+# Worker side
+# ---------------------------------------------------------------------------
+
+_data = None
+_threads = None
+
+def _init_worker(threads):
+    global _threads
+    _threads = threads
+
+def _load_data():
+    global _data
+    if _data is None:
+        download_mnist()
+        (x_train, y_train), _ = load_mnist()
+        x_train, y_train = preprocess_data(x_train, y_train)
+        _data = (
+            (x_train[:-VALIDATION_SIZE], y_train[:-VALIDATION_SIZE]),
+            (x_train[-VALIDATION_SIZE:], y_train[-VALIDATION_SIZE:])
+        )
+    return _data
+
+def run_trial(trial_id, config, target_batches, state=None, seed=0):
+    """
+    Train one trial up to target_batches total batches. state is the
+    previous rung's result["state"]: batches done, the network (weights and
+    momentum), the RNG state before the current epoch's shuffle and the
+    batches done in that epoch, so the trial continues with exactly the
+    batch it would have seen next.
+    """
+    (x_train, y_train), (x_val, y_val) = _load_data()
+
+    if state is None:
+        np.random.seed(seed + trial_id)
+        nn = build_network(config["architecture"])
+        done, epoch_batch, epoch_rng = 0, 0, None
+    else:
+        nn = build_network(config["architecture"])
+        nn.set_state(state["network"])
+        done, epoch_batch, epoch_rng = state["batches"], state["epoch_batch"], state["epoch_rng"]
+    loss_fn = CrossEntropy()
+    optimizer = SGD(learning_rate=config["learning_rate"], momentum=config["momentum"])
+
+    started = time.perf_counter()
+    loss = float("nan")
+    diverged = False
+    with limit_blas_threads(_threads):
+        while done < target_batches and not diverged:
+            # The RNG state before the shuffle identifies the epoch's batch order
+            if epoch_rng is None:
+                epoch_rng = np.random.get_state()
+            else:
+                np.random.set_state(epoch_rng)
+            for x_batch, y_batch in get_batches(x_train, y_train, config["batch_size"], start_batch=epoch_batch):
+                loss, _ = nn.train_step(x_batch, y_batch, loss_fn, optimizer)
+                done += 1
+                epoch_batch += 1
+                diverged = not np.isfinite(loss)
+                if diverged or done >= target_batches:
+                    break
+            else:
+                # Epoch finished; the next one shuffles from where the RNG is now
+                epoch_rng, epoch_batch = None, 0
+        val_acc = compute_accuracy(y_val, nn.predict(x_val))
+    return {
+        "trial": trial_id,
+        "config": config,
+        "batches": done,
+        "loss": float(loss),
+        "val_accuracy": float(val_acc),
+        "seconds": time.perf_counter() - started,
+        "pid": os.getpid(),
+        "state": {
+            "batches": done, "network": nn.get_state(),
+            "epoch_rng": epoch_rng, "epoch_batch": epoch_batch
+        },
+    }
+
+# ---------------------------------------------------------------------------
+# Driver side
+# ---------------------------------------------------------------------------
+
+def check_workers(workers, threads, trials):
+    """
+    Number of worker processes: one per `threads` cores by default, never
+    more than the cores or trials can use. Every worker holds its own copy
+    of MNIST (about 250 MB), so pass an explicit count on small hosts.
+    """
+    cores = max(1, (os.cpu_count() or 1) // threads)
+    if workers is None:
+        workers = cores
+    if isinstance(workers, bool) or int(workers) != workers or workers < 1:
+        raise ValueError(f"workers must be a positive integer, got {workers!r}")
+    return min(int(workers), cores, max(1, trials))
+
+def leaderboard(results, top=10):
+    """Best result per trial, ranked by validation accuracy."""
+    best = {}
+    for r in results:
+        key = r["trial"]
+        if key not in best or (r["batches"], r["val_accuracy"]) > (best[key]["batches"], best[key]["val_accuracy"]):
+            best[key] = r
+    ranked = sorted(best.values(), key=lambda r: (r["batches"], r["val_accuracy"]), reverse=True)
+    return [{k: v for k, v in r.items() if k != "state"} for r in ranked[:top]]
+
+def successive_halving(configs, min_batches=100, eta=3, rungs=3, workers=None, threads=1,
+                       results_path=None, on_result=None, should_stop=None, seed=0):
+    """
+    Run configs with successive halving on a process pool.
+
+    on_result(result, rung, leaderboard) is called in the driver for every
+    finished trial; should_stop() is polled to cancel the sweep.
+    Returns the final leaderboard.
+    """
+    for config in configs:
+        validate_config(config)
+    workers = check_workers(workers, threads, len(configs))
+
+    survivors = {i: None for i in range(len(configs))}
+    results = []
+    results_file = open(results_path, "a") if results_path else None
+    # Workers are spawned lazily and read the BLAS thread count from the
+    # environment when they import NumPy, so keep it pinned throughout
+    with pinned_env(threads):
+        executor = concurrent.futures.ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(threads,),
+        )
+        try:
+            for rung in range(rungs):
+                budget = min_batches * eta ** rung
+                futures = [
+                    executor.submit(run_trial, trial_id, configs[trial_id], budget, state, seed)
+                    for trial_id, state in survivors.items()
+                ]
+                rung_results = []
+                for future in concurrent.futures.as_completed(futures):
+                    result = future.result()
+                    result["rung"] = rung
+                    rung_results.append(result)
+                    results.append(result)
+                    if results_file:
+                        record = {k: v for k, v in result.items() if k != "state"}
+                        results_file.write(json.dumps(record, separators=(",", ":")) + "\n")
+                        results_file.flush()
+                    if on_result:
+                        on_result(result, rung, leaderboard(results))
+                    if should_stop and should_stop():
+                        return leaderboard(results)
+
+                # Keep the best 1/eta; trials whose loss diverged never survive
+                keep = max(1, len(rung_results) // eta)
+                ranked = sorted(
+                    (r for r in rung_results if np.isfinite(r["loss"])),
+                    key=lambda r: r["val_accuracy"], reverse=True
+                )[:keep]
+                survivors = {r["trial"]: r["state"] for r in ranked}
+                if not survivors:
+                    break
+        finally:
+            executor.shutdown(cancel_futures=True)
+            if results_file:
+                results_file.close()
+    return leaderboard(results)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--search", choices=["grid", "random"], default="random")
+    parser.add_argument("--trials", type=int, default=12, help="Number of random-search trials")
+    parser.add_argument("--space", help="JSON file overriding the search space")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--threads", type=int, default=1, help="BLAS threads per worker")
+    parser.add_argument("--min-batches", type=int, default=100, help="Batches per trial in the first rung")
+    parser.add_argument("--eta", type=int, default=3)
+    parser.add_argument("--rungs", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default="sweep_results.jsonl")
+    args = parser.parse_args()
+
+    space = dict(DEFAULT_SPACE)
+    if args.space:
+        with open(args.space) as f:
+            space.update(json.load(f))
+    configs = grid_search(space) if args.search == "grid" else random_search(space, args.trials, args.seed)
+    print(f"Sweeping {len(configs)} configs, results -> {args.out}")
+
+    def report(result, rung, board):
+        print(f"[rung {rung}] trial {result['trial']:>3} {result['config']} "
+              f"batches={result['batches']} val_acc={result['val_accuracy']:.4f} ({result['seconds']:.1f}s)")
+
+    board = successive_halving(
+        configs, min_batches=args.min_batches, eta=args.eta, rungs=args.rungs,
+        workers=args.workers, threads=args.threads, results_path=args.out,
+        on_result=report, seed=args.seed
+    )
+    print("\nLeaderboard:")
+    for i, r in enumerate(board, 1):
+        print(f"{i:>2}. val_acc={r['val_accuracy']:.4f} batches={r['batches']} {r['config']}")
+
+if __name__ == "__main__":
+    main()
@@ -110,6 +110,195 @@ def test_network_module():
         traceback.print_exc()
         return False
 
+def test_conv_gradients():
+    """Compare Conv2D/MaxPool2D backward passes with numerical gradients"""
+    print("\nTesting convolution gradients...")
+    
+    try:
+        import numpy as np
+        from network import Conv2D, MaxPool2D
+        rng = np.random.RandomState(0)
+        
+        def max_error(layer, x, params=()):
+            # Gradients of sum(output * r) for a fixed random r
+            r = rng.randn(*layer.forward(x).shape)
+            grads = {'input': layer.backward(r, 0)}
+            grads.update({name: getattr(layer, name + '_grad') for name in params})
+            error = 0.0
+            for name, analytic in grads.items():
+                arr = x if name == 'input' else getattr(layer, name)
+                for idx in np.ndindex(arr.shape):
+                    old = arr[idx]
+                    arr[idx] = old + 1e-6
+                    plus = np.sum(layer.forward(x) * r)
+                    arr[idx] = old - 1e-6
+                    minus = np.sum(layer.forward(x) * r)
+                    arr[idx] = old
+                    error = max(error, abs((plus - minus) / 2e-6 - analytic[idx]))
+            return error
+        
+        checks = [
+            ("Conv2D", Conv2D(2, 3, 3), rng.randn(2, 6, 6, 2), ('weights', 'bias')),
+            ("Conv2D stride 2, padding 1", Conv2D(2, 3, 3, stride=2, padding=1), rng.randn(2, 7, 7, 2), ('weights', 'bias')),
+            ("MaxPool2D", MaxPool2D(2), rng.randn(2, 6, 6, 3), ()),
+            ("MaxPool2D 3x3 stride 2", MaxPool2D(3, 2), rng.randn(2, 7, 7, 2), ())
+        ]
+        all_ok = True
+        for name, layer, x, params in checks:
+            error = max_error(layer, x, params)
+            ok = error < 1e-6
+            all_ok &= ok
+            print(f"  {'✅' if ok else '❌'} {name} (max gradient error: {error:.2e})")
+        return all_ok
+        
+    except Exception as e:
+        print(f"  ❌ Error: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_checkpoint_resume():
+    """Check that training resumed from a checkpoint matches an uninterrupted run"""
+    print("\nTesting checkpoint resume...")
+    
+    try:
+        import tempfile
+        import numpy as np
+        from network import CrossEntropy, SGD, Adam, build_network
+        from network.checkpoint import snapshot, save_checkpoint, load_checkpoint, restore
+        from data.loader import get_batches
+        
+        rng = np.random.RandomState(0)
+        x = rng.rand(100, 20)
+        y = np.eye(4)[rng.randint(0, 4, 100)]
+        
+        def train(nn, optimizer, position, steps):
+            # Same loop as the server: the RNG state before each shuffle marks the epoch
+            epoch, batch, epoch_rng = position
+            while steps:
+                if epoch_rng is None:
+                    epoch_rng = np.random.get_state()
+                else:
+                    np.random.set_state(epoch_rng)
+                for x_batch, y_batch in get_batches(x, y, 16, start_batch=batch):
+                    nn.train_step(x_batch, y_batch, CrossEntropy(), optimizer)
+                    batch += 1
+                    steps -= 1
+                    if not steps:
+                        return epoch, batch, epoch_rng
+                epoch, batch, epoch_rng = epoch + 1, 0, None
+            return epoch, batch, epoch_rng
+        
+        all_ok = True
+        # 7 batches per epoch: the checkpoint falls mid-epoch, the rest crosses epochs
+        for name, make_optimizer in (("SGD", lambda: SGD(0.1, momentum=0.9)), ("Adam", lambda: Adam(0.01))):
+            np.random.seed(1)
+            reference, reference_optimizer = build_network([20, 16, 4]), make_optimizer()
+            train(reference, reference_optimizer, (0, 0, None), 22)
+            expected_rng = np.random.get_state()
+            
+            np.random.seed(1)
+            nn, optimizer = build_network([20, 16, 4]), make_optimizer()
+            epoch, batch, epoch_rng = train(nn, optimizer, (0, 0, None), 10)
+            with tempfile.TemporaryDirectory() as tmp:
+                path = os.path.join(tmp, "checkpoint.npz")
+                save_checkpoint(path, snapshot(nn, optimizer, epoch, batch, epoch_rng))
+                np.random.seed(2)  # whatever the RNG did since must not matter
+                resumed, resumed_optimizer, rng_state = restore(load_checkpoint(path))
+            train(resumed, resumed_optimizer, (epoch, batch, rng_state), 12)
+            error = max(
+                np.max(np.abs(a[key] - b[key]))
+                for a, b in zip(resumed.get_state(), reference.get_state()) for key in a
+            )
+            buffers = resumed_optimizer.get_state(), reference_optimizer.get_state()
+            error = max([error] + [np.max(np.abs(buffers[0][k] - buffers[1][k])) for k in buffers[1]])
+            ok = (
+                error == 0 and buffers[0].keys() == buffers[1].keys()
+                and resumed_optimizer.iterations == reference_optimizer.iterations
+                and np.array_equal(np.random.get_state()[1], expected_rng[1])
+            )
+            all_ok &= ok
+            print(f"  {'✅' if ok else '❌'} {name}: 10 + 12 steps vs 22 uninterrupted (max difference: {error:.1e})")
+        return all_ok
+        
+    except Exception as e:
+        print(f"  ❌ Error: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_optimizers():
+    """Compare the in-place optimizer updates with the reference formulas, and check schedules"""
+    print("\nTesting optimizers and schedules...")
+    
+    try:
+        import math
+        import numpy as np
+        from network import Dense, Adam, AdamW, RMSProp, Schedule, StepDecay, CosineDecay, EarlyStopping, make_schedule
+        rng = np.random.RandomState(0)
+        lr, eps, b1, b2, rho, wd = 0.01, 1e-8, 0.9, 0.999, 0.9, 0.1
+        
+        def adam(w, g, state, t, decay=0.0):
+            m, v = state.get('m', 0.0), state.get('v', 0.0)
+            if decay:
+                w = w * (1 - lr * decay)
+            m = b1 * m + (1 - b1) * g
+            v = b2 * v + (1 - b2) * g ** 2
+            state.update(m=m, v=v)
+            return w - lr * (m / (1 - b1 ** t)) / (np.sqrt(v / (1 - b2 ** t)) + eps)
+        
+        def rmsprop(w, g, state, t):
+            v = rho * state.get('v', 0.0) + (1 - rho) * g ** 2
+            state['v'] = v
+            return w - lr * g / (np.sqrt(v) + eps)
+        
+        checks = [
+            ("Adam", Adam(lr, b1, b2, eps), adam, adam),
+            ("AdamW", AdamW(lr, b1, b2, eps, weight_decay=wd), lambda *a: adam(*a, decay=wd), adam),
+            ("RMSProp", RMSProp(lr, rho, eps), rmsprop, rmsprop)
+        ]
+        all_ok = True
+        for name, optimizer, weight_rule, bias_rule in checks:
+            layer = Dense(6, 4)
+            w, b = layer.weights.copy(), layer.bias.copy()
+            w_state, b_state = {}, {}
+            for t in range(1, 6):
+                layer.weights_grad, layer.bias_grad = rng.randn(6, 4), rng.randn(1, 4)
+                w = weight_rule(w, layer.weights_grad, w_state, t)
+                b = bias_rule(b, layer.bias_grad, b_state, t)
+                optimizer.update([layer])
+            error = max(np.max(np.abs(layer.weights - w)), np.max(np.abs(layer.bias - b)))
+            ok = error < 1e-12
+            all_ok &= ok
+            print(f"  {'✅' if ok else '❌'} {name} matches the reference over 5 steps (max error: {error:.1e})")
+        
+        schedule_checks = [
+            ("warmup", [Schedule(0.1, warmup_steps=4)(s) for s in (0, 3, 10)], [0.025, 0.1, 0.1]),
+            ("step decay", [StepDecay(0.1, 10, 0.5)(s) for s in (0, 9, 10, 25)], [0.1, 0.1, 0.05, 0.025]),
+            ("cosine", [CosineDecay(0.1, 100, min_lr=0.01)(s) for s in (0, 50, 100, 200)], [0.1, 0.055, 0.01, 0.01]),
+            ("cosine with warmup", [make_schedule('cosine', 0.1, 110, 10)(s) for s in (0, 10, 110)], [0.01, 0.1, 0.0]),
+            ("make_schedule step", [make_schedule('step', 0.1, 40)(s) for s in (9, 10, 39)], [0.1, 0.05, 0.0125])
+        ]
+        for name, got, expected in schedule_checks:
+            ok = all(math.isclose(a, e, rel_tol=1e-9, abs_tol=1e-12) for a, e in zip(got, expected))
+            all_ok &= ok
+            print(f"  {'✅' if ok else '❌'} {name} schedule {[round(a, 6) for a in got]}")
+        
+        target = EarlyStopping(target=0.9)
+        patience = EarlyStopping(patience=2, min_delta=0.01)
+        stops = [target.update(s, a) for s, a in enumerate((0.5, 0.8, 0.95))]
+        stops += [patience.update(s, a) for s, a in enumerate((0.5, 0.6, 0.605, 0.65, 0.64, 0.655))]
+        ok = stops == [False, False, True, False, False, False, False, False, True] and patience.best_step == 3
+        all_ok &= ok
+        print(f"  {'✅' if ok else '❌'} EarlyStopping ({target.reason}; {patience.reason})")
+        return all_ok
+        
+    except Exception as e:
+        print(f"  ❌ Error: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
 def test_data_loader():
     """Test if data loader works"""
     print("\nTesting data loader...")
@@ -166,6 +355,9 @@ def main():
     all_passed &= test_imports()
     all_passed &= test_file_structure()
     all_passed &= test_network_module()
+    all_passed &= test_conv_gradients()
+    all_passed &= test_checkpoint_resume()
+    all_passed &= test_optimizers()
     all_passed &= test_data_loader()
     all_passed &= test_server_config()
     
@@ -2,6 +2,8 @@ import numpy as np
 import pickle
 import os
 from network import NeuralNetwork, Dense, ReLU, Softmax, CrossEntropy, SGD
+from network.threads import limit_blas_threads
+from autotune import autotune
 from data.loader import download_mnist, load_mnist, preprocess_data, get_batches
 
 def compute_accuracy(y_true, y_pred):
@@ -18,7 +20,7 @@ def save_model(network, filepath):
         pickle.dump(weights, f)
     print(f"Model saved to {filepath}")
 
-def train():
+def train(batch_size=None):
     # 1. Load Data
     download_mnist()
     (x_train, y_train), (x_test, y_test) = load_mnist()
@@ -40,33 +42,38 @@ def train():
     optimizer = SGD(learning_rate=0.1, momentum=0.9)
     
     epochs = 5
-    batch_size = 64
+    threads = None
+    if batch_size is None:
+        tuning = autotune([784, 128, 64, 10])
+        batch_size, threads = tuning["batch_size"], tuning["threads"]
+        print(f"Autotuned batch size {batch_size}, BLAS threads {threads or 'default'}")
     
     print("Starting training...")
-    for epoch in range(epochs):
-        epoch_loss = 0
-        epoch_acc = 0
-        batches = 0
+    with limit_blas_threads(threads):
+        for epoch in range(epochs):
+            epoch_loss = 0
+            epoch_acc = 0
+            batches = 0
         
-        for x_batch, y_batch in get_batches(x_train, y_train, batch_size):
-            loss, y_pred = nn.train_step(x_batch, y_batch, loss_fn, optimizer)
+            for x_batch, y_batch in get_batches(x_train, y_train, batch_size):
+                loss, y_pred = nn.train_step(x_batch, y_batch, loss_fn, optimizer)
             
-            acc = compute_accuracy(y_batch, y_pred)
-            epoch_loss += loss
-            epoch_acc += acc
-            batches += 1
+                acc = compute_accuracy(y_batch, y_pred)
+                epoch_loss += loss
+                epoch_acc += acc
+                batches += 1
             
-            if batches % 100 == 0:
-                print(f"Epoch {epoch+1}, Batch {batches}: Loss = {loss:.4f}, Acc = {acc:.4f}")
+                if batches % 100 == 0:
+                    print(f"Epoch {epoch+1}, Batch {batches}: Loss = {loss:.4f}, Acc = {acc:.4f}")
         
-        avg_loss = epoch_loss / batches
-        avg_acc = epoch_acc / batches
-        print(f"Epoch {epoch+1} Complete. Avg Loss: {avg_loss:.4f}, Avg Acc: {avg_acc:.4f}")
+            avg_loss = epoch_loss / batches
+            avg_acc = epoch_acc / batches
+            print(f"Epoch {epoch+1} Complete. Avg Loss: {avg_loss:.4f}, Avg Acc: {avg_acc:.4f}")
         
-        # Evaluate on test set
-        test_pred = nn.predict(x_test[:1000]) # Sample for speed
-        test_acc = compute_accuracy(y_test[:1000], test_pred)
-        print(f"Test Accuracy: {test_acc:.4f}")
+            # Evaluate on test set
+            test_pred = nn.predict(x_test[:1000]) # Sample for speed
+            test_acc = compute_accuracy(y_test[:1000], test_pred)
+            print(f"Test Accuracy: {test_acc:.4f}")
 
     # 3. Save Model
     os.makedirs('models', exist_ok=True)
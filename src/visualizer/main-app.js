@@ -122,6 +122,68 @@ window.setLR = async function (value) {
     }
 };
 
+// ====================================================================================
+// WIRE PROTOCOL (binary frames, see src/serving/protocol.py)
+// ====================================================================================
+const WireProtocol = {
+    float16ToFloat32(h) {
+        const sign = (h & 0x8000) ? -1 : 1;
+        const exp = (h >> 10) & 0x1f;
+        const frac = h & 0x3ff;
+        if (exp === 0) return sign * Math.pow(2, -14) * (frac / 1024);
+        if (exp === 31) return frac ? NaN : sign * Infinity;
+        return sign * Math.pow(2, exp - 15) * (1 + frac / 1024);
+    },
+
+    decodeFrame(buffer) {
+        const view = new DataView(buffer);
+        const bytes = new Uint8Array(buffer);
+        if (bytes[0] !== 0x4e || bytes[1] !== 0x56) throw new Error('Not a binary frame');
+        const count = view.getUint8(3);
+        const decoder = new TextDecoder();
+        const messages = [];
+        let offset = 4;
+        for (let m = 0; m < count; m++) {
+            const metaLen = view.getUint32(offset, true);
+            offset += 4;
+            const message = JSON.parse(decoder.decode(bytes.subarray(offset, offset + metaLen)));
+            offset += metaLen;
+            const nArrays = view.getUint16(offset, true);
+            offset += 2;
+            const arrays = [];
+            for (let a = 0; a < nArrays; a++) {
+                const code = view.getUint8(offset);
+                const length = view.getUint32(offset + 1, true);
+                offset += 5;
+                const values = new Array(length);
+                if (code === 2) {
+                    const lo = view.getFloat32(offset, true);
+                    const scale = view.getFloat32(offset + 4, true);
+                    offset += 8;
+                    for (let i = 0; i < length; i++) values[i] = lo + bytes[offset + i] * scale;
+                    offset += length;
+                } else if (code === 1) {
+                    for (let i = 0; i < length; i++) values[i] = this.float16ToFloat32(view.getUint16(offset + 2 * i, true));
+                    offset += 2 * length;
+                } else {
+                    for (let i = 0; i < length; i++) values[i] = view.getFloat32(offset + 4 * i, true);
+                    offset += 4 * length;
+                }
+                arrays.push(values);
+            }
+            if (nArrays) message.activations = arrays;
+            messages.push(message);
+        }
+        return messages;
+    },
+
+    decode(data) {
+        if (typeof data !== 'string') return this.decodeFrame(data);
+        const message = JSON.parse(data);
+        return message.type === 'batch' ? message.messages : [message];
+    }
+};
+
 // ====================================================================================
 // BACKEND MANAGER
 // ====================================================================================
@@ -134,6 +196,8 @@ class BackendManager {
         this.onConnect = null;
         this.onDisconnect = null;
         this.onTrainingComplete = null;
+        // Activations come as float16 binary frames instead of JSON floats
+        this.protocol = { protocol: 'binary', precision: 'f16' };
     }
 
     connect() {
@@ -157,20 +221,16 @@ class BackendManager {
         console.log('🔌 Connecting to WebSocket:', wsUrl);
 
         this.ws = new WebSocket(wsUrl);
+        this.ws.binaryType = 'arraybuffer';
         this.ws.onopen = () => {
             console.log('✅ Connected');
             this.connected = true;
+            this.ws.send(JSON.stringify({ type: 'hello', ...this.protocol }));
             if (this.onConnect) this.onConnect();
         };
         this.ws.onmessage = (event) => {
-            const data = JSON.parse(event.data);
-
-            if (data.type === 'pause_moment' && this.onPauseMoment) {
-                this.onPauseMoment(data);
-            } else if (data.type === 'update' && this.onUpdate) {
-                this.onUpdate(data);
-            } else if (data.type === 'training_complete' && this.onTrainingComplete) {
-                this.onTrainingComplete(data);
+            for (const data of WireProtocol.decode(event.data)) {
+                this.dispatch(data);
             }
         };
         this.ws.onclose = () => {
@@ -181,6 +241,16 @@ class BackendManager {
         };
     }
 
+    dispatch(data) {
+        if (data.type === 'pause_moment' && this.onPauseMoment) {
+            this.onPauseMoment(data);
+        } else if (data.type === 'update' && this.onUpdate) {
+            this.onUpdate(data);
+        } else if (data.type === 'training_complete' && this.onTrainingComplete) {
+            this.onTrainingComplete(data);
+        }
+    }
+
     async startTraining() {
         const r = await fetch('/start-training', { method: 'POST' });
         return await r.json();
@@ -819,11 +889,19 @@ class MainApp {
             console.error('NN engine not loaded!');
             return;
         }
+        if (weightsData.some(ld => ld.type === 'Conv2D')) {
+            // The local engine is Dense-only, so convolutional models aren't mirrored in the browser
+            this.localNN = null;
+            console.log('ℹ️ Convolutional model: local NN disabled');
+            return;
+        }
         const layers = [];
         weightsData.forEach(ld => {
-            if (ld.type === 'Dense') {
+            if (ld.type === 'Dense' || ld.type === 'QuantizedDense') {
                 const layer = new window.NN.Dense(ld.inputSize, ld.outputSize, 'relu');
-                layer.weights = new window.NN.Matrix(ld.inputSize, ld.outputSize, ld.weights);
+                // int8 weights (/get-weights?format=int8) carry one scale per neuron
+                const weights = ld.scales ? ld.weights.map(row => row.map((q, j) => q * ld.scales[j])) : ld.weights;
+                layer.weights = new window.NN.Matrix(ld.inputSize, ld.outputSize, weights);
                 layer.biases = new window.NN.Matrix(1, ld.outputSize, ld.bias);
                 layers.push(layer);
             }